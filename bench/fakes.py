@@ -0,0 +1,315 @@
+"""
+Offline stand-ins for the services riff talks to, used by bench/suite.py.
+
+- Catalog: a synthetic artist with albums and tracks.
+- FakeYoutubeDL: answers the extract_info / process_ie_result /
+  prepare_filename calls riff makes from that catalog, and "downloads" a
+  fixed audio fixture with progress hooks, optionally at a set link speed.
+- LocalServices: a local HTTP server speaking the Musixmatch (token.get,
+  track.search, track.subtitle.get) and Genius (api/search/multi, song
+  pages) endpoints used by lyrics.py, and serving album covers.
+
+install() patches yt_dlp.YoutubeDL, which riff imports inside its
+functions, so nothing here needs the network.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlparse
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, joint stereo: 417-byte frames of 1152 samples
+_MP3_HEADER = b"\xff\xfb\x90\x64"
+_MP3_FRAME = 417
+_MP3_FRAMES_PER_SECOND = 44100 / 1152
+
+# Smallest thing that looks like a JPEG to mutagen and the artwork cache
+COVER = b"\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00" + b"\x00" * 2048 + b"\xff\xd9"
+
+
+def silent_mp3(seconds: float) -> bytes:
+    """A valid, silent MP3 of about `seconds` (no ID3 tag), so no encoder is needed."""
+    frame = _MP3_HEADER + b"\x00" * (_MP3_FRAME - len(_MP3_HEADER))
+    return frame * max(1, int(seconds * _MP3_FRAMES_PER_SECOND))
+
+
+class Catalog:
+    """
+    One artist (`handle`) with `albums` releases of `tracks` tracks each.
+    Every other track has synced lyrics on "Musixmatch"; the rest are only
+    on "Genius", so both lookups are exercised.
+    """
+
+    def __init__(
+        self,
+        handle: str = "bench",
+        artist: str = "Bench Artist",
+        albums: int = 5,
+        tracks: int = 10,
+        audio: Optional[bytes] = None,
+        ext: str = "mp3",
+        duration: float = 180,
+    ):
+        self.handle = handle
+        self.artist = artist
+        self.album_count = albums
+        self.track_count = tracks
+        self.duration = duration
+        self.audio = audio if audio is not None else silent_mp3(duration)
+        self.ext = ext
+        # Set by LocalServices once it listens
+        self.cover_root = "http://127.0.0.1:9/"
+
+    def albums(self) -> List[Dict[str, str]]:
+        return [
+            {"title": f"Album {a:04d}", "url": f"https://www.youtube.com/playlist?list=OLAK{a:04d}"}
+            for a in range(1, self.album_count + 1)
+        ]
+
+    def tracks(self, album_no: int) -> List[Dict[str, str]]:
+        return [
+            {"title": self.track_title(album_no, t), "url": f"https://www.youtube.com/watch?v={self.video_id(album_no, t)}"}
+            for t in range(1, self.track_count + 1)
+        ]
+
+    def jobs(self) -> List[Tuple[Dict[str, str], int, Dict[str, str]]]:
+        """Every track as a DownloadPipeline job, built like riff's own callers build them."""
+        from pipeline import album_jobs
+
+        return [
+            job
+            for a, album in enumerate(self.albums(), 1)
+            for job in album_jobs(album, self.tracks(a), self.artist)
+        ]
+
+    @staticmethod
+    def video_id(album_no: int, track_no: int) -> str:
+        return f"v{album_no:06d}{track_no:04d}"
+
+    @staticmethod
+    def track_title(album_no: int, track_no: int) -> str:
+        return f"Song {album_no}-{track_no}"
+
+    @staticmethod
+    def has_synced(title: str) -> bool:
+        return title.rsplit("-", 1)[-1].isdigit() and int(title.rsplit("-", 1)[-1]) % 2 == 0
+
+
+class FakeYoutubeDL:
+    """
+    The slice of yt_dlp.YoutubeDL riff uses. `extract_latency` is slept per
+    extraction (watch page, player JS); `link_speed` (bytes/s, 0 = instant)
+    paces each download.
+    """
+
+    catalog: Optional[Catalog] = None  # set by install()
+    extract_latency = 0.0
+    link_speed = 0.0
+    chunk_size = 256 * 1024
+
+    def __init__(self, params: Optional[Dict[str, Any]] = None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self) -> None:
+        pass
+
+    def extract_info(self, url: str, download: bool = True, process: bool = True) -> Dict[str, Any]:
+        if self.extract_latency:
+            time.sleep(self.extract_latency)
+        cat = self.catalog
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+
+        if parsed.path.endswith("/releases"):
+            if parsed.path.strip("/").split("/")[0] != f"@{cat.handle}":
+                raise Exception(f"ERROR: [youtube:tab] {url}: This channel does not exist")
+            entries: Any = iter(cat.albums())
+            return {"_type": "playlist", "entries": entries if not process else list(entries)}
+
+        if "list" in query:
+            album_no = int(query["list"][0][4:])
+            return {
+                "_type": "playlist",
+                "title": f"Album {album_no:04d}",
+                "entries": cat.tracks(album_no),
+                "thumbnails": [
+                    {"url": f"{cat.cover_root}cover/{album_no}.jpg", "width": 120, "height": 120},
+                    {"url": f"{cat.cover_root}cover/{album_no}.jpg?hq", "width": 544, "height": 544},
+                ],
+            }
+
+        if "v" in query:
+            vid = query["v"][0]
+            album_no, track_no = int(vid[1:7]), int(vid[7:])
+            return {
+                "id": vid,
+                "title": cat.track_title(album_no, track_no),
+                "ext": cat.ext,
+                "duration": cat.duration,
+                "filesize": len(cat.audio),
+                "url": f"https://rr1.example.invalid/videoplayback?id={vid}&expire={int(time.time()) + 6 * 3600}",
+                "webpage_url": url,
+            }
+
+        raise Exception(f"ERROR: Unsupported URL: {url}")
+
+    def process_ie_result(self, info: Dict[str, Any], download: bool = True) -> Dict[str, Any]:
+        if not download:
+            return info
+
+        path = Path(self.prepare_filename(info))
+        audio = self.catalog.audio
+        hooks: List[Callable[[Dict[str, Any]], None]] = self.params.get("progress_hooks") or []
+        started = time.monotonic()
+        with open(path, "wb") as f:
+            for start in range(0, len(audio), self.chunk_size):
+                chunk = audio[start:start + self.chunk_size]
+                f.write(chunk)
+                done = start + len(chunk)
+                if self.link_speed:
+                    lag = done / self.link_speed - (time.monotonic() - started)
+                    if lag > 0:
+                        time.sleep(lag)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                for hook in hooks:
+                    hook({
+                        "status": "downloading",
+                        "filename": str(path),
+                        "downloaded_bytes": done,
+                        "total_bytes": len(audio),
+                        "speed": done / elapsed,
+                    })
+        for hook in hooks:
+            hook({"status": "finished", "filename": str(path), "downloaded_bytes": len(audio), "total_bytes": len(audio)})
+        return info
+
+    def prepare_filename(self, info: Dict[str, Any]) -> str:
+        outtmpl = self.params.get("outtmpl") or "%(title)s [%(id)s].%(ext)s"
+        return outtmpl % {"title": info.get("title"), "ext": info.get("ext"), "id": info.get("id")}
+
+
+def install(catalog: Catalog, extract_latency: float = 0.0, link_speed: float = 0.0) -> None:
+    """Serve catalog to every YoutubeDL riff creates from now on."""
+    import yt_dlp
+
+    FakeYoutubeDL.catalog = catalog
+    FakeYoutubeDL.extract_latency = extract_latency
+    FakeYoutubeDL.link_speed = link_speed
+    yt_dlp.YoutubeDL = FakeYoutubeDL
+
+
+# -------------------------
+# Musixmatch & Genius
+# -------------------------
+class LocalServices:
+    """
+    Musixmatch, Genius and cover images on 127.0.0.1, answering with the
+    response shapes lyrics.py parses. `latency` is slept per request.
+    Use as a context manager; musixmatch_root and genius_root go to
+    LyricsClient.
+    """
+
+    def __init__(self, catalog: Catalog, latency: float = 0.0):
+        self.catalog = catalog
+        self.latency = latency
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.root = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.musixmatch_root = f"{self.root}ws/1.1/"
+        self.genius_root = self.root
+        catalog.cover_root = self.root
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="bench-http")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+    def _handler(self):
+        services = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with services._count_lock:
+                    services.requests += 1
+                if services.latency:
+                    time.sleep(services.latency)
+                parsed = urlparse(self.path)
+                status, content_type, body = services.route(parsed.path, parse_qs(parsed.query))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def route(self, path: str, query: Dict[str, List[str]]) -> Tuple[int, str, bytes]:
+        def arg(name: str) -> str:
+            return query.get(name, [""])[0]
+
+        if path == "/ws/1.1/token.get":
+            return self._musixmatch({"user_token": "bench-token"})
+        if path == "/ws/1.1/track.search":
+            title = arg("q_track")
+            tracks = [{"track": {"track_id": quote(title), "track_name": title}}] if self.catalog.has_synced(title) else []
+            return self._musixmatch({"track_list": tracks})
+        if path == "/ws/1.1/track.subtitle.get":
+            title = unquote(arg("track_id"))
+            lrc = "\n".join(f"[00:{s:02d}.00] {title}, line {s}" for s in range(0, 60, 4))
+            return self._musixmatch({"subtitle": {"subtitle_body": lrc}})
+
+        if path == "/api/search/multi":
+            q = arg("q")
+            result = {
+                "url": f"{self.root}songs/{quote(q)}",
+                "full_title": f"{q} by {self.catalog.artist}",
+                "header_image_url": f"{self.root}cover/genius.jpg",
+                "primary_artist": {"name": self.catalog.artist},
+                "release_date_for_display": "January 1, 2024",
+            }
+            payload = {"response": {"sections": [{"hits": []}, {"hits": [{"result": result}]}]}}
+            return 200, "application/json", json.dumps(payload).encode()
+        if path.startswith("/songs/"):
+            return 200, "text/html; charset=utf-8", song_page(unquote(path[len("/songs/"):])).encode()
+
+        if path.startswith("/cover/"):
+            return 200, "image/jpeg", COVER
+        return 404, "text/plain", b"not found"
+
+    @staticmethod
+    def _musixmatch(body: Dict[str, Any]) -> Tuple[int, str, bytes]:
+        payload = {"message": {"header": {"status_code": 200}, "body": body}}
+        return 200, "application/json", json.dumps(payload).encode()
+
+
+def song_page(title: str, verses: int = 3) -> str:
+    """A small Genius-like song page: some head weight, then the lyrics containers."""
+    head = "".join(f'<script>window.__c{i}={{"k":"{"x" * 200}"}};</script>' for i in range(20))
+    containers = "".join(
+        f'<div data-lyrics-container="true" class="Lyrics__Container">[Verse {v}]<br>'
+        + "<br/>".join(f"<span>{title}, verse {v} line {n}</span>" for n in range(6))
+        + "</div>"
+        for v in range(1, verses + 1)
+    )
+    return f"<!doctype html><html><head><title>{title}</title>{head}</head><body><main>{containers}</main></body></html>"
+
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark Genius lyrics extraction: streaming parser vs. BeautifulSoup.
+
+Runs both extractors over the saved pages in bench/fixtures/genius/*.html
+(or the files given on the command line), checks they agree and prints the
+per-page timings and speedup. Save a real page as a fixture with --fetch URL.
+
+The checked-in synthetic-song.html is hand-built, not a saved page: it copies
+the markup a real page throws at the parser (several lyrics containers with
+the header and hidden spans nested inside, ad slots between them, entities,
+the preloaded state blob)
+with placeholder lyrics, since real lyrics can't be redistributed. When no
+fixture exists a synthetic Genius-like page is generated.
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent / "src"))
+
+from lyrics import extract_genius_lyrics, _extract_genius_lyrics_bs4, BROWSER_UA  # noqa: E402
+
+FIXTURES = ROOT / "fixtures" / "genius"
+
+
+def synthetic_page(verses: int = 6) -> str:
+    """Roughly the shape of a Genius song page: a heavy head, lyrics, a large preloaded state blob."""
+    head = "".join(
+        f'<link rel="preload" href="/assets/chunk-{i}.js" as="script">'
+        f'<script>window.__c{i}={{"k":"{"x" * 400}"}};</script>'
+        for i in range(200)
+    )
+    nav = "".join(f'<li class="nav-{i}"><a href="/tag/{i}">Tag {i}</a></li>' for i in range(300))
+    containers = []
+    for v in range(verses):
+        lines = "<br/>".join(
+            f'<a href="/{v}-{n}" class="ReferentFragment"><span>Line {n} of verse {v} &amp; more</span></a>'
+            for n in range(8)
+        )
+        containers.append(
+            f'<div data-lyrics-container="true" class="Lyrics__Container">[Verse {v}]<br>{lines}<br><i>(echo)</i></div>'
+        )
+    state = '{"songPage":' + ",".join(f'"{i}":"{"y" * 300}"' for i in range(600)) + "}"
+    return (
+        f"<!doctype html><html><head><title>Song</title>{head}</head><body>"
+        f"<header><ul>{nav}</ul></header><main><div id=\"lyrics-root\">{''.join(containers)}</div></main>"
+        f"<footer>{nav}</footer><script>window.__PRELOADED_STATE__ = JSON.parse('{state}');</script>"
+        "</body></html>"
+    )
+
+
+def timeit(fn, html: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def fetch(url: str) -> Path:
+    import requests
+
+    html = requests.get(url, headers={"User-Agent": BROWSER_UA}, timeout=15).text
+    FIXTURES.mkdir(parents=True, exist_ok=True)
+    path = FIXTURES / (url.rstrip("/").rsplit("/", 1)[-1] + ".html")
+    path.write_text(html, encoding="utf-8")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Genius lyrics extraction.")
+    parser.add_argument("files", nargs="*", help="Saved Genius pages (default: bench/fixtures/genius/*.html)")
+    parser.add_argument("--fetch", metavar="URL", help="Download a Genius page into the fixtures and exit")
+    parser.add_argument("-r", "--repeat", type=int, default=20, help="Runs per extractor (best is kept)")
+    args = parser.parse_args()
+
+    if args.fetch:
+        print(f"Saved {fetch(args.fetch)}")
+        return
+
+    pages = [(Path(f).name, Path(f).read_text(encoding="utf-8")) for f in args.files]
+    if not pages:
+        pages = [(p.name, p.read_text(encoding="utf-8")) for p in sorted(FIXTURES.glob("*.html"))]
+    if not pages:
+        pages = [("synthetic", synthetic_page())]
+
+    print(f"{'page':<40} {'size':>8} {'bs4 ms':>9} {'stream ms':>10} {'speedup':>8}")
+    total_old = total_new = 0.0
+    for name, html in pages:
+        if extract_genius_lyrics(html) != _extract_genius_lyrics_bs4(html):
+            print(f"{name}: MISMATCH between extractors")
+            sys.exit(1)
+
+        old = timeit(_extract_genius_lyrics_bs4, html, args.repeat)
+        new = timeit(extract_genius_lyrics, html, args.repeat)
+        total_old += old
+        total_new += new
+        print(f"{name[:40]:<40} {len(html) // 1024:>6}KB {old * 1000:>9.2f} {new * 1000:>10.2f} {old / new:>7.1f}x")
+
+    print(f"{'total':<40} {'':>8} {total_old * 1000:>9.2f} {total_new * 1000:>10.2f} {total_old / total_new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark CLI startup: wall time and import time per subcommand.
+
+Each command runs `src/main.py` in a fresh interpreter, with HOME pointed at
+an empty temporary directory so no real cache is read. The runs are cheap
+(missing input, no handles), so the timing is mostly what the command
+imports before doing any work. The TUI cannot start headless, so its row
+imports the `tui` package instead. `-X importtime` gives the import total
+and the heaviest top-level modules.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent
+SRC = ROOT.parent / "src"
+MAIN = str(SRC / "main.py")
+
+COMMANDS: Dict[str, List[str]] = {
+    "version": [MAIN, "--version"],
+    "help": [MAIN, "--help"],
+    "convert": [MAIN, "convert"],
+    "metadata": [MAIN, "metadata"],
+    "library": [MAIN, "--output", "{tmp}", "library"],
+    "sync": [MAIN, "sync"],
+    "tui (import)": ["-c", f"import sys; sys.path.insert(0, {str(SRC)!r}); import tui"],
+}
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def run(argv: List[str], env: Dict[str, str], importtime: bool = False) -> Tuple[float, str]:
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + argv
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+    return time.perf_counter() - start, proc.stderr
+
+
+def import_profile(stderr: str, top: int) -> Tuple[float, List[Tuple[str, float]]]:
+    """Total import ms and the `top` heaviest top-level modules (cumulative ms)."""
+    roots = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match and not match.group(3):
+            roots.append((match.group(4), int(match.group(2)) / 1000))
+    total = sum(ms for _, ms in roots)
+    return total, sorted(roots, key=lambda r: -r[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark riff startup per subcommand.")
+    parser.add_argument("commands", nargs="*", help=f"Subset of: {', '.join(COMMANDS)}")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Runs per command (median is kept)")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest imports to list per command")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    names = args.commands or list(COMMANDS)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {**os.environ, "HOME": tmp}
+        print(f"{'command':<14} {'wall ms':>8} {'import ms':>10}  heaviest imports")
+        for name in names:
+            argv = [a.replace("{tmp}", tmp) for a in COMMANDS[name]]
+            run(argv, env)  # warm the filesystem and bytecode caches
+            wall = statistics.median(run(argv, env)[0] for _ in range(args.repeat))
+            total, heaviest = import_profile(run(argv, env, importtime=True)[1], args.top)
+
+            results[name] = {"wall_ms": wall * 1000, "import_ms": total, "heaviest": heaviest}
+            top = ", ".join(f"{mod} {ms:.0f}" for mod, ms in heaviest)
+            print(f"{name:<14} {wall * 1000:>8.1f} {total:>10.1f}  {top}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
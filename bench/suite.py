@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the parts of riff that talk to the network.
+
+yt-dlp is replaced by bench/fakes.py's FakeYoutubeDL, which serves a
+synthetic artist and "downloads" a fixed audio fixture (a generated silent
+MP3 unless --audio is given). Musixmatch, Genius and album covers are served
+by a local HTTP server. Every run uses an empty temporary HOME, so caches
+start cold and nothing real is read or written.
+
+Benchmarks:
+  pipeline  download → convert → tag → lyrics throughput of DownloadPipeline
+  cache     Cache set/get latency, load and flush time
+  tui       time until the TUI lists N releases and has preloaded their tracks
+
+Conversion runs only when --format differs from the fixture's format, which
+needs ffmpeg. Results go to bench/results/<time>-<commit>.json; --compare
+checks them against an earlier file (the latest one by default).
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(ROOT.parent / "src"))
+
+from fakes import Catalog, LocalServices, install, silent_mp3  # noqa: E402
+from throttle import parse_rate  # noqa: E402
+
+RESULTS = ROOT / "results"
+BENCHMARKS = ("pipeline", "cache", "tui")
+
+# name -> {"value", "unit", "better": "lower" | "higher"}
+Results = Dict[str, Dict[str, Any]]
+
+
+def record(results: Results, name: str, value: float, unit: str, better: str = "lower") -> None:
+    results[name] = {"value": value, "unit": unit, "better": better}
+    print(f"  {name:<28} {value:>12.2f} {unit}")
+
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def fresh_home(home: Path) -> None:
+    """Point riff's lazily created caches and clients at a new, empty HOME."""
+    import artwork
+    import downloader
+    import lyrics
+
+    home.mkdir(parents=True, exist_ok=True)
+    os.environ["HOME"] = str(home)
+    downloader._cache = None
+    artwork._artwork = None
+    lyrics._client = None
+
+
+# -------------------------
+# Pipeline
+# -------------------------
+def check_fair_order() -> None:
+    """Warn unless two artists' jobs, built as riff builds them, take turns in the download queue."""
+    from pipeline import fair_order
+
+    big, small = Catalog(artist="Big", albums=3, tracks=4), Catalog(artist="Small", albums=2, tracks=1)
+    order = [album.get("artist") for album, _, _ in fair_order(big.jobs() + small.jobs())]
+    if order[:4] != ["Big", "Small", "Big", "Small"]:
+        print(f"  warning: fair_order does not interleave artists: {order[:6]}")
+
+
+def bench_pipeline(args, tmp: Path, results: Results) -> None:
+    from cache import Cache
+    import lyrics
+    from pipeline import DownloadPipeline
+    from progress import ProgressAggregator
+    from throttle import HostLimit
+    import tracing
+
+    if args.audio:
+        audio, ext = Path(args.audio).read_bytes(), Path(args.audio).suffix.lstrip(".")
+    else:
+        audio, ext = silent_mp3(args.duration), "mp3"
+    converts = args.format.lower() != ext.lower()
+    if converts and not shutil.which("ffmpeg"):
+        print(f"  skipped: converting {ext} to {args.format} needs ffmpeg (use --format {ext})")
+        return
+
+    check_fair_order()
+    catalog = Catalog(albums=args.albums, tracks=args.tracks, audio=audio, ext=ext, duration=args.duration)
+    install(catalog, extract_latency=args.extract_latency / 1000, link_speed=args.link_speed)
+    n = args.albums * args.tracks
+    print(f"  {n} tracks of {len(audio) / 2 ** 20:.1f} MiB {ext}, "
+          f"{'converted to ' + args.format if converts else 'no conversion'}, {args.jobs} download workers")
+
+    with LocalServices(catalog, latency=args.api_latency / 1000) as services:
+        runs = []
+        for run in range(args.repeat):
+            home = tmp / f"pipeline-{run}"
+            fresh_home(home)
+            # The providers' real request rates would make lyrics the whole benchmark
+            limits = None if args.provider_limits else {"musixmatch": HostLimit(4, 0), "genius": HostLimit(4, 0)}
+            lyrics._client = lyrics.LyricsClient(
+                musixmatch_root=services.musixmatch_root,
+                genius_root=services.genius_root,
+                cache=Cache(str(home / "lyrics.cache"), flush_interval=2),
+                limits=limits,
+            )
+            pipeline = DownloadPipeline(
+                home / "music",
+                target_format=args.format,
+                artist=catalog.artist,
+                progress=ProgressAggregator(),
+                download_workers=args.jobs,
+            )
+
+            if args.trace and run == args.repeat - 1:
+                tracing.enable()
+            start = time.perf_counter()
+            finished = pipeline.run(catalog.jobs())
+            runs.append(time.perf_counter() - start)
+
+            lrc = len(list((home / "music").rglob("*.lrc")))
+            if len(finished) != n or lrc != n:
+                print(f"  warning: run {run + 1} finished {len(finished)}/{n} tracks and {lrc}/{n} lyrics")
+
+    if args.trace:
+        tracing.disable()
+        tracing.write_chrome_trace(args.trace)
+        print(tracing.format_summary())
+
+    seconds = statistics.median(runs)
+    record(results, "pipeline.seconds", seconds, "s")
+    record(results, "pipeline.tracks_per_s", n / seconds, "tracks/s", "higher")
+    record(results, "pipeline.mib_per_s", n * len(audio) / 2 ** 20 / seconds, "MiB/s", "higher")
+
+
+# -------------------------
+# Cache
+# -------------------------
+def _latencies_us(fn: Callable[[str], Any], keys: List[str]) -> List[float]:
+    out = []
+    for key in keys:
+        start = time.perf_counter_ns()
+        fn(key)
+        out.append((time.perf_counter_ns() - start) / 1000)
+    return out
+
+
+def bench_cache(args, tmp: Path, results: Results) -> None:
+    from cache import Cache
+
+    # Shaped like the album track lists that make up most of the extraction cache
+    value = [{"title": f"Song {i}", "url": f"https://www.youtube.com/watch?v=v{i:010d}"} for i in range(12)]
+    n = args.cache_entries
+    keys = [f"album_tracks:https://www.youtube.com/playlist?list=OLAK{i:08d}" for i in range(n)]
+    print(f"  {n} entries of {len(value)} tracks")
+
+    # Write-through rewrites the whole file per set, so it only gets the first 1000 keys
+    sync = Cache(str(tmp / "cache" / "sync.cache"))
+    lat = _latencies_us(lambda k: sync.set(k, value), keys[:min(n, 1000)])
+    record(results, "cache.set_write_through.p50", percentile(lat, 50), "µs")
+    record(results, "cache.set_write_through.p95", percentile(lat, 95), "µs")
+
+    path = str(tmp / "cache" / "coalesced.cache")
+    coalesced = Cache(path, flush_interval=3600)
+    lat = _latencies_us(lambda k: coalesced.set(k, value), keys)
+    record(results, "cache.set_coalesced.p50", percentile(lat, 50), "µs")
+    record(results, "cache.set_coalesced.p95", percentile(lat, 95), "µs")
+
+    start = time.perf_counter()
+    coalesced.flush()
+    record(results, "cache.flush_ms", (time.perf_counter() - start) * 1000, "ms")
+
+    shuffled = random.Random(0).sample(keys, len(keys))
+    lat = _latencies_us(coalesced.get, shuffled)
+    record(results, "cache.get_hit.p50", percentile(lat, 50), "µs")
+    record(results, "cache.get_hit.p95", percentile(lat, 95), "µs")
+    lat = _latencies_us(coalesced.get, [k + "#missing" for k in shuffled])
+    record(results, "cache.get_miss.p50", percentile(lat, 50), "µs")
+
+    loads = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        Cache(path)
+        loads.append(time.perf_counter() - start)
+    record(results, "cache.load_ms", statistics.median(loads) * 1000, "ms")
+
+
+# -------------------------
+# TUI
+# -------------------------
+async def _populate(n: int, tracks: int, home: Path, timeout: float) -> Dict[str, Optional[float]]:
+    from tui import RiffApp
+    from tui.downloader import DownloaderScreen
+
+    catalog = Catalog(albums=n, tracks=tracks)
+    install(catalog)
+    app = RiffApp(handle=catalog.handle, artist=catalog.artist, options={"output_dir": str(home / "music")})
+
+    listed = preloaded = None
+    start = time.perf_counter()
+    async with app.run_test(headless=True, size=(120, 40)) as pilot:
+        while time.perf_counter() - start < timeout:
+            await pilot.pause(0.005)
+            screen = app.screen
+            if not isinstance(screen, DownloaderScreen):
+                continue
+            if listed is None and screen.query_one("#album_list").border_title.startswith("Releases"):
+                listed = time.perf_counter() - start
+            if listed is not None and len(screen.album_tracks) == n:
+                preloaded = time.perf_counter() - start
+                break
+    return {"listed": listed, "preloaded": preloaded}
+
+
+def bench_tui(args, tmp: Path, results: Results) -> None:
+    for n in args.tui_sizes:
+        fresh_home(tmp / f"tui-{n}")
+        times = asyncio.run(_populate(n, args.tui_tracks, tmp / f"tui-{n}", args.timeout))
+        if times["listed"] is None or times["preloaded"] is None:
+            print(f"  {n} releases: timed out after {args.timeout:.0f}s")
+            continue
+        record(results, f"tui.list_{n}_ms", times["listed"] * 1000, "ms")
+        record(results, f"tui.preload_{n}_ms", times["preloaded"] * 1000, "ms")
+
+
+# -------------------------
+# Results
+# -------------------------
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save(results: Results, meta: Dict[str, Any], path: Optional[str]) -> Path:
+    out = Path(path) if path else RESULTS / f"{time.strftime('%Y%m%d-%H%M%S')}-{meta['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps({"meta": meta, "results": results}, indent=2, ensure_ascii=False))
+    return out
+
+
+def compare(results: Results, meta: Dict[str, Any], baseline_path: Path, threshold: float) -> int:
+    """Print current vs baseline; returns the number of regressions beyond threshold (a fraction)."""
+    baseline = json.loads(baseline_path.read_text())
+    print(f"\nCompared with {baseline_path.name} ({baseline['meta'].get('commit')})")
+
+    changed = {
+        k: (v, meta["args"].get(k))
+        for k, v in baseline["meta"].get("args", {}).items()
+        if meta["args"].get(k) != v
+    }
+    if changed:
+        print("  note: settings differ: " + ", ".join(f"{k} {a} → {b}" for k, (a, b) in changed.items()))
+
+    regressions = 0
+    print(f"{'benchmark':<30} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, cur in results.items():
+        base = baseline["results"].get(name)
+        if not base or not base["value"]:
+            continue
+        change = (cur["value"] - base["value"]) / base["value"]
+        worse = change > threshold if cur["better"] == "lower" else change < -threshold
+        better = change < -threshold if cur["better"] == "lower" else change > threshold
+        regressions += worse
+        flag = "  regression" if worse else "  improved" if better else ""
+        print(f"{name:<30} {base['value']:>12.2f} {cur['value']:>12.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for riff (fake yt-dlp, local lyrics server).")
+    parser.add_argument("benchmarks", nargs="*", help=f"Subset of: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Pipeline runs and cache loads (median is kept)")
+
+    group = parser.add_argument_group("pipeline")
+    group.add_argument("--albums", type=int, default=5)
+    group.add_argument("--tracks", type=int, default=10, help="Tracks per album")
+    group.add_argument("--duration", type=float, default=180, help="Seconds of the generated audio fixture")
+    group.add_argument("--audio", metavar="FILE", help="Serve this file as every track instead (e.g. a real .webm)")
+    group.add_argument("--format", default="mp3", help="Target format; differs from the fixture's to include ffmpeg")
+    group.add_argument("--jobs", type=int, default=3, help="Download workers")
+    group.add_argument("--extract-latency", type=float, default=50, metavar="MS", help="Per yt-dlp extraction")
+    group.add_argument("--api-latency", type=float, default=10, metavar="MS", help="Per lyrics or cover request")
+    group.add_argument("--link-speed", type=parse_rate, default=0, metavar="RATE", help="Per download, e.g. 20M; 0 is instant")
+    group.add_argument("--provider-limits", action="store_true", help="Keep Musixmatch/Genius request rate limits")
+    group.add_argument("--trace", metavar="FILE", help="Trace the last run's stages to a Chrome trace file")
+
+    group = parser.add_argument_group("cache and tui")
+    group.add_argument("--cache-entries", type=int, default=10000)
+    group.add_argument("--tui-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[10, 1000, 10000],
+                       metavar="N,N,...", help="Release counts to list (default: 10,1000,10000)")
+    group.add_argument("--tui-tracks", type=int, default=5, help="Tracks per release to preload")
+    group.add_argument("--timeout", type=float, default=300, help="Seconds before a TUI run is given up")
+
+    group = parser.add_argument_group("results")
+    group.add_argument("-o", "--output", metavar="PATH", help="Where to save (default: bench/results/<time>-<commit>.json)")
+    group.add_argument("--no-save", action="store_true")
+    group.add_argument("--compare", nargs="?", const="latest", metavar="PATH",
+                       help="Compare with a saved result (default: the latest in bench/results)")
+    group.add_argument("--threshold", type=float, default=10, metavar="PCT", help="Change counted as a regression")
+    args = parser.parse_args()
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    baseline = None
+    if args.compare:
+        saved = sorted(RESULTS.glob("*.json"))
+        baseline = Path(args.compare) if args.compare != "latest" else (saved[-1] if saved else None)
+        if baseline is None:
+            parser.error("no saved results in bench/results to compare with")
+
+    meta = {
+        "commit": _commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ffmpeg": bool(shutil.which("ffmpeg")),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "no_save", "compare", "threshold", "trace")},
+    }
+
+    results: Results = {}
+    runners = {"pipeline": bench_pipeline, "cache": bench_cache, "tui": bench_tui}
+    with tempfile.TemporaryDirectory(prefix="riff-bench-") as tmp:
+        for name in args.benchmarks or BENCHMARKS:
+            print(f"{name}:")
+            runners[name](args, Path(tmp), results)
+
+    if not args.no_save:
+        print(f"\nSaved {save(results, meta, args.output)}")
+    if baseline is not None and compare(results, meta, baseline, args.threshold / 100):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Asyncio counterparts of the blocking fetchers in downloader.py and lyrics.py.
+
+The blocking work runs on one shared, bounded executor. Awaiting callers
+(e.g. Textual workers) can be cancelled at any time: searches and release
+listings are told to stop and quit at their next result or page. A single
+extraction or request already in flight is left to finish in the
+background, where it still fills the cache.
+
+When riffd is running (client.get_remote()), the work is sent to it and
+answered from its shared caches; otherwise, or once riffd stops answering,
+it runs in this process.
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import downloader
+from client import DaemonUnreachable, RiffClient, get_remote
+from lyrics import LyricsClient, get_client
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_DONE = object()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="aio")
+        return _executor
+
+
+def shutdown() -> None:
+    """Stop the executor without waiting for abandoned work."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+class _HangUp(Exception):
+    """Raised from a daemon event handler to abandon the request once its caller is cancelled."""
+
+
+async def _run(
+    fn: Callable[..., Any],
+    *args: Any,
+    on_cancel: Optional[threading.Event] = None,
+    **kwargs: Any,
+) -> Any:
+    """Await fn(*args, **kwargs) on the executor; on cancellation set `on_cancel` for fn to see."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor(), partial(fn, *args, **kwargs))
+    except asyncio.CancelledError:
+        if on_cancel is not None:
+            on_cancel.set()
+        raise
+
+
+def _remote_or_local(remote_fn: Callable[[RiffClient], Any], local_fn: Callable[[], Any]) -> Any:
+    """remote_fn(riffd's client) while riffd answers, else local_fn(); blocking, for the executor."""
+    remote = get_remote()
+    if remote:
+        try:
+            return remote_fn(remote)
+        except DaemonUnreachable:
+            pass  # riffd went away mid-session; this and later calls run here
+    return local_fn()
+
+
+# -------------------------
+# YouTube
+# -------------------------
+async def iter_artist_albums(artist: str, refresh: bool = False) -> AsyncIterator[Dict[str, str]]:
+    """Yield releases as yt-dlp pages through them; stop iterating (or cancel) to stop the paging."""
+    loop = asyncio.get_running_loop()
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(item: Any) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            stop.set()  # the loop is gone
+
+    sent = [0]
+
+    def consume(albums) -> None:
+        for album in albums:
+            if stop.is_set():
+                albums.close()
+                return
+            put(album)
+            sent[0] += 1
+
+    def produce() -> None:
+        remote = get_remote()
+        try:
+            if remote:
+                try:
+                    consume(remote.stream("artist_albums", handle=artist, refresh=refresh))
+                    return
+                except DaemonUnreachable:
+                    if sent[0]:
+                        raise  # the releases listed so far cannot be taken back
+            consume(downloader.iter_artist_albums(artist, refresh))
+        except Exception as e:
+            put(e)
+        finally:
+            put(_DONE)
+
+    executor().submit(produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+async def get_artist_albums(artist: str, refresh: bool = False) -> List[Dict[str, str]]:
+    return [album async for album in iter_artist_albums(artist, refresh)]
+
+
+async def get_album_tracks(album_url: str, refresh: bool = False) -> List[Dict[str, str]]:
+    return await _run(
+        _remote_or_local,
+        lambda remote: remote.call("album_tracks", url=album_url, refresh=refresh),
+        partial(downloader.get_album_tracks, album_url, refresh),
+    )
+
+
+async def search_artist(
+    query: str,
+    on_result: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+) -> List[Dict[str, str]]:
+    """
+    Like downloader.search_artist; on_result is called on the event loop, in
+    the caller's context. Cancelling stops the search at its next result.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    cancel = threading.Event()
+
+    def partial_result(results: List[Dict[str, str]]) -> None:
+        if on_result and not cancel.is_set():
+            loop.call_soon_threadsafe(on_result, results, context=context)
+
+    def remote_result(results: List[Dict[str, str]]) -> None:
+        if cancel.is_set():
+            raise _HangUp()  # closes the connection, so the daemon stops searching
+        partial_result(results)
+
+    def remote_search(remote: RiffClient) -> List[Dict[str, str]]:
+        try:
+            return remote.call("search_artist", on_event=remote_result, query=query)
+        except _HangUp:
+            return []  # cancelled; nobody is waiting for the results
+
+    return await _run(
+        _remote_or_local,
+        remote_search,
+        partial(downloader.search_artist, query, on_result=partial_result, cancel=cancel),
+        on_cancel=cancel,
+    )
+
+
+# -------------------------
+# Lyrics
+# -------------------------
+async def get_lyrics(
+    artist: str,
+    title: str,
+    duration: Optional[float] = None,
+    client: Optional[LyricsClient] = None,
+    use_old: bool = False,
+    fallback: bool = True,
+) -> dict:
+    if client is not None:
+        return await _run(client.get_lyrics, artist, title, use_old, fallback, duration)
+    return await _run(
+        _remote_or_local,
+        lambda remote: remote.call(
+            "lyrics", artist=artist, title=title, duration=duration, use_old=use_old, fallback=fallback
+        ),
+        lambda: get_client().get_lyrics(artist, title, use_old, fallback, duration),
+    )
+
+
+async def fetch_lyrics_metadata(search_term: str, client: Optional[LyricsClient] = None) -> dict:
+    if client is not None:
+        return await _run(client.fetch_lyrics_metadata, search_term)
+    return await _run(
+        _remote_or_local,
+        lambda remote: remote.call("lyrics_metadata", search_term=search_term),
+        lambda: get_client().fetch_lyrics_metadata(search_term),
+    )
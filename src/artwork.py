@@ -0,0 +1,115 @@
+import os
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+from cache import Cache
+from converter import resize_image
+
+
+class ArtworkCache:
+    """
+    Content-addressed store for album covers.
+
+    Images are saved under the sha256 of the downloaded bytes, already resized,
+    so every album is downloaded and resized once no matter how many tracks
+    (or URLs) point at the same picture. Without a working resize, only
+    JPEG and PNG originals are kept.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(
+        self,
+        root: str = "~/.cache/riff/artwork",
+        size: int = 600,
+        ttl: int = 60 * 60 * 24 * 30,  # 30 days
+    ):
+        self.root = Path(os.path.expanduser(root))
+        self.size = size
+        # url -> content digest
+        self.index = Cache(str(self.root / "index.cache"), ttl=ttl)
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/120.0.0.0 Safari/537.36"
+            ),
+        })
+        # Striped per-URL locks: a fixed set, so the cache doesn't keep a lock per URL forever
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def get(self, url: str) -> Optional[bytes]:
+        """Return the resized cover for url, downloading it on first use."""
+        if not url:
+            return None
+
+        with self._lock_for(url):
+            digest = self.index.get(url)
+            if digest and self._path(digest).exists():
+                return self._path(digest).read_bytes()
+
+            try:
+                digest = self._fetch(url)
+            except Exception:
+                return None
+
+            self.index.set(url, digest)
+            return self._path(digest).read_bytes()
+
+    def _fetch(self, url: str) -> str:
+        r = self.session.get(url, timeout=15)
+        r.raise_for_status()
+        raw = r.content
+
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._path(digest)
+        if path.exists():
+            # Same picture already stored under another URL
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, src = tempfile.mkstemp(dir=path.parent, suffix=".src")
+        tmp = str(path) + ".tmp.jpg"
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(raw)
+            try:
+                resize_image(src, tmp, self.size)
+            except Exception:
+                # No ffmpeg or unknown format: JPEG and PNG can be embedded as they are (the
+                # tagger sniffs their type); anything else (webp) is not stored, so get() retries
+                if not raw.startswith((b"\xff\xd8\xff", b"\x89PNG")):
+                    raise
+                os.replace(src, tmp)
+            os.replace(tmp, path)
+        finally:
+            for leftover in (src, tmp):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+        return digest
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.jpg"
+
+    def _lock_for(self, url: str) -> threading.Lock:
+        return self._locks[hash(url) % self.LOCK_STRIPES]
+
+
+_artwork: Optional[ArtworkCache] = None
+_artwork_lock = threading.Lock()
+
+
+def get_artwork() -> ArtworkCache:
+    """Return the process-wide ArtworkCache, opening its index on first use."""
+    global _artwork
+    with _artwork_lock:
+        if _artwork is None:
+            _artwork = ArtworkCache()
+        return _artwork
@@ -1,9 +1,12 @@
 import os
 import time
+import atexit
 import pickle
 import threading
 from typing import Any, Dict, Tuple, Optional
 
+import metrics
+
 
 CacheEntry = Tuple[float, Any]
 
@@ -13,37 +16,80 @@ class Cache:
         self,
         path: str,
         ttl: int = 60 * 60 * 24 * 3,  # 3 days
+        flush_interval: float = 0,
     ):
+        """
+        :param flush_interval: If > 0, writes are coalesced and the file is
+            rewritten at most once per interval (and at exit) instead of on
+            every set. Useful for large caches written from many threads.
+        """
         self.path = os.path.expanduser(path)
         self.ttl = ttl
+        self.flush_interval = flush_interval
         self._cache: Dict[str, CacheEntry] = {}
         self._lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        # Lookups since start, reported by metrics
+        self.hits = 0
+        self.misses = 0
 
         self._load()
+        metrics.track_cache(self)
+
+        if flush_interval > 0:
+            atexit.register(self.flush)
 
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: str, ttl: Optional[int] = None) -> Optional[Any]:
+        """Return the value for key, or None if missing or older than ttl (defaults to self.ttl)."""
         with self._lock:
             entry = self._cache.get(key)
             if not entry:
+                self.misses += 1
                 return None
 
             ts, value = entry
-            if time.time() - ts > self.ttl:
+            if time.time() - ts > (self.ttl if ttl is None else ttl):
                 del self._cache[key]
-                self._store()
+                self._changed()
+                self.misses += 1
                 return None
 
+            self.hits += 1
             return value
 
+    def __len__(self) -> int:
+        return len(self._cache)
+
     def set(self, key: str, value: Any) -> None:
         with self._lock:
             self._cache[key] = (time.time(), value)
-            self._store()
+            self._changed()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._cache.pop(key, None) is not None:
+                self._changed()
 
     def clear(self) -> None:
         with self._lock:
             self._cache.clear()
+            self._changed()
+
+    def flush(self) -> None:
+        """Write pending changes to disk now."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+                self._store()
+
+    def _changed(self) -> None:
+        if self.flush_interval <= 0:
             self._store()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
 
     def _load(self) -> None:
         if not os.path.exists(self.path):
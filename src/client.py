@@ -0,0 +1,147 @@
+"""
+Client side of riffd (see daemon.py).
+
+get_remote() returns a RiffClient when a daemon answers on the socket and
+None otherwise, in which case callers do the work in-process as before.
+When the daemon stops answering, requests raise DaemonUnreachable and the
+next get_remote() looks for it again. Each request opens its own
+connection, so one client is safe to share between threads.
+"""
+
+import os
+import json
+import socket
+import threading
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from progress import ProgressAggregator
+
+SOCKET_PATH = "~/.cache/riff/riffd.sock"
+
+
+class DaemonError(Exception):
+    """The daemon could not be reached, or answered a request with an error."""
+
+
+class DaemonUnreachable(DaemonError):
+    """The daemon did not answer at all; the request never ran, or its outcome is unknown."""
+
+
+class RiffClient:
+    def __init__(self, path: str = SOCKET_PATH, timeout: Optional[float] = None):
+        self.path = os.path.expanduser(path)
+        self.timeout = timeout
+
+    def call(self, method: str, on_event: Optional[Callable[[Any], None]] = None, **params: Any) -> Any:
+        """
+        Run method on the daemon and return its result. Streaming methods
+        pass each event to on_event first; an exception raised there
+        abandons the request (the daemon notices when it writes next).
+        """
+        for message in self._request(method, params):
+            if "event" in message:
+                if on_event:
+                    on_event(message["event"])
+            else:
+                return self._result(message)
+        forget(self)
+        raise DaemonUnreachable(f"riffd closed the connection during {method}")
+
+    def stream(self, method: str, **params: Any) -> Iterator[Any]:
+        """The events of a streaming method; close the iterator to abandon it."""
+        for message in self._request(method, params):
+            if "event" in message:
+                yield message["event"]
+            else:
+                self._result(message)
+                return
+        forget(self)
+        raise DaemonUnreachable(f"riffd closed the connection during {method}")
+
+    def ping(self) -> Optional[Dict[str, Any]]:
+        """Daemon info, or None when none is running."""
+        try:
+            return self.call("ping")
+        except DaemonError:
+            return None
+
+    def watch(self, batch: int, progress: ProgressAggregator) -> Dict[str, Any]:
+        """Mirror a batch's progress and log into progress until it ends; returns its outcome."""
+        return self.call(
+            "watch",
+            on_event=lambda e: progress.apply(e["snapshot"], e["logs"]),
+            batch=batch,
+        )
+
+    def _request(self, method: str, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            try:
+                sock.connect(self.path)
+                sock.sendall(json.dumps({"id": 1, "method": method, "params": params}).encode() + b"\n")
+            except OSError as e:
+                forget(self)
+                raise DaemonUnreachable(f"riffd is not reachable at {self.path}: {e}") from e
+
+            try:
+                with sock.makefile("rb") as lines:
+                    for line in lines:
+                        yield json.loads(line)
+            except (OSError, ValueError) as e:
+                # A hung or broken daemon is as good as none
+                forget(self)
+                raise DaemonUnreachable(f"riffd did not answer {method}: {e}") from e
+        finally:
+            sock.close()
+
+    @staticmethod
+    def _result(message: Dict[str, Any]) -> Any:
+        if "error" in message:
+            raise DaemonError(message["error"])
+        return message.get("result")
+
+
+_remote: Optional[RiffClient] = None
+_checked = False
+_remote_lock = threading.Lock()
+
+
+def get_remote() -> Optional[RiffClient]:
+    """The client of a running riffd, looked up once per process; None means work in-process."""
+    global _remote, _checked
+    with _remote_lock:
+        if not _checked:
+            _checked = True
+            client = RiffClient()
+            if os.path.exists(client.path) and RiffClient(client.path, timeout=2).ping() is not None:
+                _remote = client
+        return _remote
+
+
+def forget(client: RiffClient) -> None:
+    """client stopped answering: if it is the shared one, the next get_remote() looks again."""
+    global _remote, _checked
+    if client is not _remote:
+        return  # e.g. get_remote()'s own probe, which runs under the lock
+    with _remote_lock:
+        if _remote is client:
+            _remote, _checked = None, False
+
+
+def disable() -> None:
+    """Never use the daemon in this process (e.g. --no-daemon)."""
+    global _remote, _checked
+    with _remote_lock:
+        _remote, _checked = None, True
+
+
+def absolute_options(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Options with paths made absolute, since the daemon runs in another directory."""
+    options = dict(options)
+    if options.get("output_dir"):
+        options["output_dir"] = os.path.abspath(os.path.expanduser(str(options["output_dir"])))
+    cookies = options.get("cookies")
+    if cookies and os.path.exists(os.path.expanduser(cookies)):
+        options["cookies"] = os.path.abspath(os.path.expanduser(cookies))
+    return options
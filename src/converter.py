@@ -2,6 +2,8 @@ import os
 import subprocess
 from typing import List, Optional
 
+import tracing
+
 
 def convert_audio(
     input_file: str,
@@ -42,6 +44,42 @@ def convert_audio(
     cmd.append(output_file)
 
     # Run conversion
+    with tracing.span("convert", format=output_format):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg error:\n{result.stderr}")
+
+    return output_file
+
+
+def resize_image(
+    input_file: str,
+    output_file: str,
+    size: int = 600,
+) -> str:
+    """
+    Scales an image down to fit a size x size box and re-encodes it as JPEG using ffmpeg.
+
+    :param input_file: Path to the input image (jpg, png, webp, ...)
+    :param output_file: Path of the JPEG to write
+    :param size: Maximum width and height in pixels
+    :return: Path to the resized file
+    """
+    if not os.path.isfile(input_file):
+        raise FileNotFoundError(f"Input file does not exist: {input_file}")
+
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-i", input_file,
+        "-vf", f"scale='min({size},iw)':'min({size},ih)':force_original_aspect_ratio=decrease",
+        "-frames:v", "1",
+        "-q:v", "3",
+        "-f", "image2",
+        output_file,
+    ]
+
     result = subprocess.run(cmd, capture_output=True, text=True)
 
     if result.returncode != 0:
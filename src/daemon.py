@@ -0,0 +1,351 @@
+"""
+riffd: an optional background process that owns the extraction and lyrics
+caches, the HTTP sessions, the download queue and its worker pools, so
+every riff client on the machine shares them instead of rebuilding them.
+
+Clients (client.py) connect to a UNIX socket and send one JSON object per
+line; the daemon answers each request in order:
+
+    request   {"id": 1, "method": "album_tracks", "params": {"url": "..."}}
+    event     {"id": 1, "event": ...}      (streaming methods, zero or more)
+    response  {"id": 1, "result": ...}  or  {"id": 1, "error": "message"}
+
+Downloads and syncs are queued as batches and run one at a time, each with
+its own ProgressAggregator that any number of clients can watch.
+"""
+
+import os
+import json
+import time
+import queue
+import signal
+import itertools
+import threading
+import socketserver
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from client import SOCKET_PATH, RiffClient
+from logs import LogRecord, LogSink
+from progress import ProgressAggregator
+
+API_VERSION = 1
+
+# Finished batches kept for `batches` and late watchers
+KEEP_BATCHES = 50
+
+# Log records kept per batch for watchers; all of them go to the log file
+KEEP_LOG = 2000
+
+# Seconds between progress events sent to watchers
+WATCH_INTERVAL = 0.1
+
+
+class ClientGone(Exception):
+    """The client closed its connection while we were streaming to it."""
+
+
+class Batch:
+    """
+    A queued download or sync with its progress. Its last KEEP_LOG log
+    records are kept, so several clients (and late ones) can watch.
+    """
+
+    def __init__(self, batch_id: int, kind: str, description: str, sink: Optional[LogSink] = None):
+        self.id = batch_id
+        self.kind = kind
+        self.description = description
+        self.state = "queued"  # -> running -> done | failed
+        self.progress = ProgressAggregator(sink=sink, max_events=KEEP_LOG)
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+        self._log: Deque[LogRecord] = deque(maxlen=KEEP_LOG)
+        self._logged = 0  # records ever added to _log
+        self._log_lock = threading.Lock()
+
+    def logs_since(self, offset: int) -> Tuple[List[LogRecord], int]:
+        """Records after the first `offset` ever logged (those still kept), and the offset to ask for next."""
+        with self._log_lock:
+            new = self.progress.drain_events(limit=KEEP_LOG)
+            self._log.extend(new)
+            self._logged += len(new)
+            kept_from = self._logged - len(self._log)
+            return list(self._log)[max(0, offset - kept_from):], self._logged
+
+    def info(self) -> Dict[str, Any]:
+        return {"id": self.id, "kind": self.kind, "description": self.description, "state": self.state, "error": self.error}
+
+
+class Daemon:
+    def __init__(self, path: str = SOCKET_PATH):
+        self.path = os.path.expanduser(path)
+        self.started = time.time()
+        self.sink = LogSink()
+        self.batches: Dict[int, Batch] = {}
+        self._batches_lock = threading.Lock()
+        self._batch_ids = itertools.count(1)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._sync_state = None
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+
+    # -------------------------
+    # Lifecycle
+    # -------------------------
+    def serve_forever(self) -> None:
+        if os.path.exists(self.path):
+            if RiffClient(self.path, timeout=2).ping() is not None:
+                raise RuntimeError(f"riffd is already running at {self.path}")
+            os.unlink(self.path)  # left behind by a daemon that died
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                daemon._handle(self.rfile, self.wfile)
+
+        old_umask = os.umask(0o177)  # the socket is for this user only
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+
+        threading.Thread(target=self._run_batches, name="batches", daemon=True).start()
+        signal.signal(signal.SIGTERM, lambda *_: self.shutdown())
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self.sink.close()
+
+    def shutdown(self) -> None:
+        # serve_forever() waits for this, so it must not run on the serving thread
+        if self._server:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    # -------------------------
+    # Protocol
+    # -------------------------
+    def _handle(self, rfile, wfile) -> None:
+        write_lock = threading.Lock()
+
+        def send(message: Dict[str, Any]) -> None:
+            data = json.dumps(message, ensure_ascii=False, default=str).encode() + b"\n"
+            try:
+                with write_lock:
+                    wfile.write(data)
+                    wfile.flush()
+            except OSError as e:
+                raise ClientGone() from e
+
+        for line in rfile:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                request = {"method": None, "error": f"bad request: {e}"}
+            request_id = request.get("id")
+
+            def emit(event: Any) -> None:
+                send({"id": request_id, "event": event})
+
+            try:
+                method = self._method(request.get("method"))
+                response = {"id": request_id, "result": method(emit, **(request.get("params") or {}))}
+            except ClientGone:
+                return
+            except Exception as e:
+                response = {"id": request_id, "error": request.get("error") or f"{type(e).__name__}: {e}"}
+            try:
+                send(response)
+            except ClientGone:
+                return
+            if request.get("method") == "shutdown":
+                self.shutdown()  # only now, or the process could exit before the reply is out
+
+    def _method(self, name: Any) -> Callable[..., Any]:
+        if not isinstance(name, str) or not hasattr(self, f"api_{name}"):
+            raise ValueError(f"unknown method {name!r}")
+        return getattr(self, f"api_{name}")
+
+    # -------------------------
+    # API: lookups (answered from the shared caches)
+    # -------------------------
+    def api_ping(self, emit) -> Dict[str, Any]:
+        with self._batches_lock:
+            states = [b.state for b in self.batches.values()]
+        return {
+            "version": API_VERSION,
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "queued": states.count("queued"),
+            "running": states.count("running"),
+        }
+
+    def api_artist_albums(self, emit, handle: str, refresh: bool = False) -> int:
+        """Streams each release as it is found; returns how many there were."""
+        from downloader import iter_artist_albums
+
+        count = 0
+        for album in iter_artist_albums(handle, refresh):
+            emit(album)
+            count += 1
+        return count
+
+    def api_album_tracks(self, emit, url: str, refresh: bool = False) -> List[Dict[str, str]]:
+        from downloader import get_album_tracks
+
+        return get_album_tracks(url, refresh)
+
+    def api_search_artist(self, emit, query: str) -> List[Dict[str, str]]:
+        """Streams partial results; stops searching once the client is gone."""
+        from downloader import search_artist
+
+        cancel = threading.Event()
+
+        def on_result(results):
+            try:
+                emit(results)
+            except ClientGone:
+                cancel.set()
+
+        results = search_artist(query, on_result=on_result, cancel=cancel)
+        if cancel.is_set():
+            raise ClientGone()
+        return results
+
+    def api_lyrics(
+        self,
+        emit,
+        artist: str,
+        title: str,
+        duration: Optional[float] = None,
+        use_old: bool = False,
+        fallback: bool = True,
+    ) -> dict:
+        from lyrics import get_client
+
+        return get_client().get_lyrics(artist, title, use_old, fallback, duration)
+
+    def api_lyrics_metadata(self, emit, search_term: str) -> dict:
+        from lyrics import get_client
+
+        return get_client().fetch_lyrics_metadata(search_term)
+
+    def api_metrics(self, emit) -> str:
+        import metrics
+
+        return metrics.render()
+
+    # -------------------------
+    # API: batches
+    # -------------------------
+    def api_download(self, emit, jobs: List[list], output_dir: str, **options: Any) -> int:
+        """Queue jobs ([album, track number, track]) for DownloadPipeline; returns the batch id."""
+        from pipeline import DownloadPipeline
+
+        jobs = [tuple(job) for job in jobs]
+
+        def run(progress: ProgressAggregator) -> Dict[str, Any]:
+            pipeline = DownloadPipeline(output_dir, progress=progress, **options)
+            finished = pipeline.run(jobs)
+            return {"finished": [str(p) for p in finished], "failed": pipeline.failed + pipeline.failed_processing}
+
+        return self._submit("download", f"{len(jobs)} tracks to {output_dir}", run)
+
+    def api_sync(self, emit, handles: Dict[str, Optional[str]], output_dir: str, **options: Any) -> int:
+        """Queue a sync of handles (handle -> artist) into output_dir as one batch (see sync.run_sync); returns the batch id."""
+        from library import LibraryIndex
+        from sync import run_sync
+
+        def run(progress: ProgressAggregator) -> Dict[str, Any]:
+            library = LibraryIndex(output_dir)
+            library.scan()
+            plans = run_sync(handles, self.sync_state(), library, progress, **options)
+            return {
+                plan.handle: {"new_albums": len(plan.new_albums), "jobs": len(plan.jobs), "skipped_owned": plan.skipped_owned}
+                for plan in plans
+            }
+
+        return self._submit("sync", f"{', '.join('@' + h for h in handles)} to {output_dir}", run)
+
+    def api_watch(self, emit, batch: int) -> Dict[str, Any]:
+        """Streams {"snapshot", "logs"} until the batch ends; returns its state, result and error."""
+        with self._batches_lock:
+            watched = self.batches.get(batch)
+        if watched is None:
+            raise KeyError(f"no batch {batch}")
+
+        offset = 0
+        while True:
+            finished = watched.done.wait(WATCH_INTERVAL)
+            logs, offset = watched.logs_since(offset)
+            emit({"snapshot": watched.progress.snapshot(), "logs": logs})
+            if finished:
+                return {"state": watched.state, "result": watched.result, "error": watched.error}
+
+    def api_batches(self, emit) -> List[Dict[str, Any]]:
+        with self._batches_lock:
+            return [b.info() for b in self.batches.values()]
+
+    def api_settings(self, emit, limit_rate: Optional[float] = None) -> Dict[str, Any]:
+        """Change daemon-wide settings; returns the current ones."""
+        from pipeline import bandwidth
+
+        if limit_rate is not None:
+            bandwidth.set_rate(limit_rate)
+        return {"limit_rate": bandwidth.rate}
+
+    def api_shutdown(self, emit) -> bool:
+        """Stop the daemon once this request has been answered (see _handle)."""
+        return True
+
+    # -------------------------
+    # Batches
+    # -------------------------
+    def sync_state(self):
+        # One SyncState for all clients, so concurrent syncs never race on the file
+        if self._sync_state is None:
+            from sync import SyncState
+
+            self._sync_state = SyncState()
+        return self._sync_state
+
+    def _submit(self, kind: str, description: str, run: Callable[[ProgressAggregator], Any]) -> int:
+        batch = Batch(next(self._batch_ids), kind, description, self.sink)
+        with self._batches_lock:
+            self.batches[batch.id] = batch
+            done = [b.id for b in self.batches.values() if b.done.is_set()]
+            for batch_id in done[:max(0, len(done) - KEEP_BATCHES)]:
+                del self.batches[batch_id]
+        self._queue.put((batch, run))
+        return batch.id
+
+    def _run_batches(self) -> None:
+        while True:
+            batch, run = self._queue.get()
+            batch.state = "running"
+            try:
+                batch.result = run(batch.progress)
+                batch.state = "done"
+            except Exception as e:
+                batch.error = str(e)
+                batch.state = "failed"
+                batch.progress.log("error", f"{batch.kind} failed: {e}")
+            finally:
+                batch.done.set()
+
+
+def main(path: str = SOCKET_PATH) -> None:
+    daemon = Daemon(path)
+    print(f"riffd listening on {daemon.path}")
+    daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,45 @@
-from typing import List, Dict
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Dict, Optional
 from collections import Counter
-from yt_dlp import YoutubeDL
 from cache import Cache
+import tracing
 
-cache = Cache("~/.cache/riff.cache")
+# yt-dlp and the cache file are loaded on first use, so importing this module
+# stays cheap for commands that never touch YouTube
+_cache: Optional[Cache] = None
+_cache_lock = threading.Lock()
 
-def get_artist_albums(artist: str) -> List[Dict[str, str]]:
+SEARCH_TTL = 60 * 60 * 6  # 6 hours
+
+
+def get_cache() -> Cache:
+    """Return the extraction cache, loading it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            # Album/track preloading writes thousands of entries; coalesce the file rewrites
+            _cache = Cache("~/.cache/riff.cache", flush_interval=2)
+        return _cache
+
+
+def get_artist_albums(artist: str, refresh: bool = False) -> List[Dict[str, str]]:
+    return list(iter_artist_albums(artist, refresh))
+
+
+def iter_artist_albums(artist: str, refresh: bool = False) -> Iterator[Dict[str, str]]:
+    """
+    Yield the releases of an artist as yt-dlp pages through them, so callers
+    can show the first albums before the whole list is known. The complete
+    list is cached once the iteration finishes.
+
+    :param refresh: Ignore the cached list and extract it again.
+    """
     cache_key = f"artist_albums:{artist}"
-    cached = cache.get(cache_key)
+    cached = None if refresh else get_cache().get(cache_key)
     if cached is not None:
-        return cached
+        yield from cached
+        return
 
     ydl_opts = {
         "extract_flat": True,
@@ -18,32 +48,35 @@ def get_artist_albums(artist: str) -> List[Dict[str, str]]:
 
     releases_url = f"https://www.youtube.com/@{artist}/releases"
 
-    with YoutubeDL(ydl_opts) as ydl:
-        info = ydl.extract_info(releases_url, download=False)
-        entries = info.get("entries", [])
+    from yt_dlp import YoutubeDL
 
-    result = [
-        {"title": e["title"], "url": e["url"]}
-        for e in entries
-        if e.get("title") and e.get("url")
-    ]
+    result = []
+    with YoutubeDL(ydl_opts) as ydl:
+        # process=False leaves entries as a lazy generator of pages
+        info = ydl.extract_info(releases_url, download=False, process=False)
+        for e in info.get("entries") or []:
+            if e.get("title") and e.get("url"):
+                album = {"title": e["title"], "url": e["url"]}
+                result.append(album)
+                yield album
 
-    cache.set(cache_key, result)
-    return result
+    get_cache().set(cache_key, result)
 
 
-def get_album_tracks(album_url: str) -> List[Dict[str, str]]:
+def get_album_tracks(album_url: str, refresh: bool = False) -> List[Dict[str, str]]:
     cache_key = f"album_tracks:{album_url}"
-    cached = cache.get(cache_key)
+    cached = None if refresh else get_cache().get(cache_key)
     if cached is not None:
         return cached
 
+    from yt_dlp import YoutubeDL
+
     ydl_opts = {
         "extract_flat": True,
         "skip_download": True,
     }
 
-    with YoutubeDL(ydl_opts) as ydl:
+    with YoutubeDL(ydl_opts) as ydl, tracing.span("album_tracks", url=album_url):
         info = ydl.extract_info(album_url, download=False)
         entries = info.get("entries", [])
 
@@ -53,64 +86,162 @@ def get_album_tracks(album_url: str) -> List[Dict[str, str]]:
         if e.get("url")
     ]
 
-    cache.set(cache_key, result)
+    get_cache().set(f"album_thumbnail:{album_url}", _best_thumbnail(info))
+    get_cache().set(cache_key, result)
     return result
 
-from yt_dlp import YoutubeDL
-from collections import Counter
-from typing import List, Dict
 
-def search_artist(query: str) -> List[Dict[str, str]]:
+def get_album_thumbnail(album_url: str) -> Optional[str]:
     """
-    Search for an artist on YouTube by exact handle first, then fallback to general search.
+    Return the cover image URL of an album, as found in the playlist info
+    fetched by get_album_tracks. Extracts the album if it is not cached yet.
+    """
+    cache_key = f"album_thumbnail:{album_url}"
+    cached = get_cache().get(cache_key)
+    if cached is None and get_cache().get(f"album_tracks:{album_url}") is None:
+        get_album_tracks(album_url)
+        cached = get_cache().get(cache_key)
+    return cached or None
+
+
+def _best_thumbnail(info: Dict[str, Any]) -> str:
+    thumbnails = [t for t in info.get("thumbnails") or [] if t.get("url")]
+    if not thumbnails:
+        return info.get("thumbnail") or ""
+
+    best = max(reversed(thumbnails), key=lambda t: (t.get("width") or 0) * (t.get("height") or 0))
+    return best["url"]
+
+def search_artist(
+    query: str,
+    on_result: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+    cancel: Optional[threading.Event] = None,
+) -> List[Dict[str, str]]:
+    """
+    Search for an artist on YouTube by exact handle and by general search at
+    the same time. The handle probe wins if it finds releases, otherwise the
+    search results are used and the other lookup is abandoned.
+    Results are cached per normalized query.
+
+    :param on_result: Called with the results known so far each time they grow,
+        before the final list is returned (for progressive display).
+    :param cancel: Set it to abandon the search; an empty list is returned.
     Returns a list of dicts: {"handle": str, "artist": str}.
     """
+    cached = get_cached_search(query)
+    if cached is not None:
+        return cached
+
+    handle = "".join(query.split(" "))
+    stop = threading.Event()
+
+    def stopped() -> bool:
+        return stop.is_set() or (cancel is not None and cancel.is_set())
+
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="search")
+    probe = pool.submit(_probe_handle, handle)
+    search = pool.submit(_search_channels, query, stopped, on_result)
+
+    try:
+        # The probe is conclusive either way; the search (already running) is
+        # only used once the probe has failed
+        if probe.result():
+            stop.set()
+            found: Optional[List[Dict[str, str]]] = [{"handle": handle, "artist": query}]
+        else:
+            found = search.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if cancel is not None and cancel.is_set():
+        return []
+
+    if found is not None:
+        get_cache().set(f"search_artist:{_normalize_query(query)}", found)
+
+    if not found:
+        return [{"handle": "", "artist": f"No results for '{query}'"}]
+    return found
+
+
+def get_cached_search(query: str) -> Optional[List[Dict[str, str]]]:
+    """Cached search_artist results for query, without touching the network."""
+    cached = get_cache().get(f"search_artist:{_normalize_query(query)}", ttl=SEARCH_TTL)
+    if cached is not None and not cached:
+        return [{"handle": "", "artist": f"No results for '{query}'"}]
+    return cached
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+def _probe_handle(handle: str) -> bool:
+    """True if @handle exists and has at least one release."""
     ydl_opts = {
         "extract_flat": True,
         "skip_download": True,
         "quiet": True,
     }
 
-    found: List[Dict[str, str]] = []
+    from yt_dlp import YoutubeDL
 
-    # Try exact handle first
-    handle = "".join(query.split(" "))
     exact_url = f"https://www.youtube.com/@{handle}/releases"
     try:
         with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(exact_url, download=False)
-            if info and info.get("entries"):
-                found.append({"handle": handle, "artist": query})
-                return found
+            # process=False keeps entries lazy, so only the first page is fetched
+            info = ydl.extract_info(exact_url, download=False, process=False)
+            return bool(info) and next(iter(info.get("entries") or []), None) is not None
     except Exception:
-        pass
+        return False
+
+
+def _search_channels(
+    query: str,
+    stopped: Callable[[], bool],
+    on_result: Optional[Callable[[List[Dict[str, str]]], None]] = None,
+) -> Optional[List[Dict[str, str]]]:
+    """Channels from the top 20 search results, most frequent first. None on error."""
+    ydl_opts = {
+        "extract_flat": True,
+        "skip_download": True,
+        "quiet": True,
+    }
+
+    from yt_dlp import YoutubeDL
 
-    # Fallback to general search
     search_url = f"ytsearch20:{query}"  # top 20 results
+    entries = []
+    seen = set()
     try:
         with YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(search_url, download=False)
-            entries = info.get("entries", [])
-
-            # Count channel appearances
-            channels = [e.get("channel") for e in entries if e.get("channel")]
-            channel_counts = Counter(channels)
+            info = ydl.extract_info(search_url, download=False, process=False)
+            for e in info.get("entries") or []:
+                if stopped():
+                    return None
+                entries.append(e)
+                if on_result and e.get("channel") and e["channel"] not in seen:
+                    seen.add(e["channel"])
+                    on_result(_rank_channels(entries, query))
+    except Exception:
+        return None
 
-            # Sort channels by frequency
-            sorted_channels = [c for c, _ in channel_counts.most_common()]
+    return _rank_channels(entries, query)
 
-            for channel_name in sorted_channels:
-                # Get first entry for this channel to extract artist title
-                entry = next((e for e in entries if e.get("channel") == channel_name), None)
-                if entry:
-                    handle = entry.get("channel").replace("@", "")
-                    artist_name = entry.get("uploader") or entry.get("title") or query
-                    found.append({"handle": handle, "artist": artist_name})
 
-    except Exception:
-        pass
+def _rank_channels(entries: List[Dict[str, Any]], query: str) -> List[Dict[str, str]]:
+    # Count channel appearances
+    channels = [e.get("channel") for e in entries if e.get("channel")]
+    channel_counts = Counter(channels)
 
-    if not found:
-        found.append({"handle": "", "artist": f"No results for '{query}'"})
+    found: List[Dict[str, str]] = []
+    # Sort channels by frequency
+    for channel_name, _ in channel_counts.most_common():
+        # Get first entry for this channel to extract artist title
+        entry = next((e for e in entries if e.get("channel") == channel_name), None)
+        if entry:
+            handle = entry.get("channel").replace("@", "")
+            artist_name = entry.get("uploader") or entry.get("title") or query
+            found.append({"handle": handle, "artist": artist_name})
 
     return found
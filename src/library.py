@@ -0,0 +1,178 @@
+import os
+import pickle
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import mutagen
+
+from utils import clean_title, extract_track_title, normalize
+
+AUDIO_EXTS = {".mp3", ".flac", ".m4a", ".mp4", ".webm", ".ogg", ".opus", ".wav"}
+
+LibraryEntry = Dict[str, Any]
+
+
+class LibraryIndex:
+    """
+    On-disk index of the audio files under a music directory.
+
+    Entries are keyed by path and remember the file's mtime and size, so a
+    rescan only stats unchanged files and reads tags (with mutagen) for new
+    or modified ones. The index lives in ~/.cache/riff/library/, one file
+    per library root.
+    """
+
+    def __init__(self, root: str, index_path: Optional[str] = None, workers: int = 8):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        if index_path is None:
+            digest = hashlib.sha1(self.root.encode()).hexdigest()[:16]
+            index_path = f"~/.cache/riff/library/{digest}.index"
+        self.index_path = os.path.expanduser(index_path)
+        self.workers = workers
+        self.entries: Dict[str, LibraryEntry] = {}
+        self._owned: Dict[str, Set[str]] = {}
+
+        self._load()
+
+    # -------------------------
+    # Scanning
+    # -------------------------
+    def scan(self, on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+        """
+        Bring the index up to date with the files on disk.
+        Returns counts of files seen, (re)read and removed.
+        """
+        seen: Set[str] = set()
+        changed: List[Tuple[str, int, int]] = []
+
+        for path, mtime, size in self._walk():
+            seen.add(path)
+            old = self.entries.get(path)
+            if old is None or old["mtime"] != mtime or old["size"] != size:
+                changed.append((path, mtime, size))
+            if on_progress and len(seen) % 1000 == 0:
+                on_progress(len(seen))
+
+        # Tag reading is I/O bound; spread the first (or big) pass over threads
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for (path, mtime, size), tags in zip(changed, pool.map(lambda c: self._read_tags(c[0]), changed)):
+                self.entries[path] = {"mtime": mtime, "size": size, **tags}
+
+        removed = [p for p in self.entries if p not in seen]
+        for path in removed:
+            del self.entries[path]
+
+        if changed or removed:
+            self._store()
+        self._build_lookup()
+
+        return {"files": len(seen), "updated": len(changed), "removed": len(removed)}
+
+    def _walk(self):
+        stack = [self.root]
+        while stack:
+            try:
+                it = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTS:
+                            st = entry.stat()
+                            yield entry.path, st.st_mtime_ns, st.st_size
+                    except OSError:
+                        continue
+
+    @staticmethod
+    def _read_tags(path: str) -> Dict[str, str]:
+        p = Path(path)
+        _, fallback_title = extract_track_title(p.name)
+        tags = {"artist": "", "album": p.parent.name, "title": fallback_title or p.stem, "tracknumber": ""}
+
+        try:
+            audio = mutagen.File(path, easy=True)
+        except Exception:
+            audio = None
+
+        if audio is not None and audio.tags:
+            for key in tags:
+                values = audio.tags.get(key)
+                if values:
+                    tags[key] = str(values[0])
+        return tags
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def owned_tracks(self, album: str) -> Set[str]:
+        """Normalized titles of the tracks we have for an album (empty if none)."""
+        return self._owned.get(normalize(album), set())
+
+    def owns_album(self, album: str) -> bool:
+        return normalize(album) in self._owned
+
+    def owns_track(self, album: str, title: str, artist: Optional[str] = None) -> bool:
+        return normalize(clean_title(title, artist)) in self.owned_tracks(album)
+
+    def _build_lookup(self) -> None:
+        owned: Dict[str, Set[str]] = {}
+        for path, entry in self.entries.items():
+            title = normalize(clean_title(entry["title"]))
+            owned.setdefault(normalize(entry["album"]), set()).add(title)
+            # Hardlinked duplicates carry another release's tags; their directory still names this one
+            owned.setdefault(normalize(os.path.basename(os.path.dirname(path))), set()).add(title)
+        self._owned = owned
+
+    # -------------------------
+    # Persistence
+    # -------------------------
+    def _load(self) -> None:
+        if not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, "rb") as f:
+                data = pickle.load(f)
+            if isinstance(data, dict) and data.get("root") == self.root:
+                self.entries = data["entries"]
+        except Exception:
+            # Corrupt index → rescan from scratch
+            self.entries = {}
+        self._build_lookup()
+
+    def _store(self) -> None:
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp = self.index_path + ".tmp"
+
+        with open(tmp, "wb") as f:
+            pickle.dump({"root": self.root, "entries": self.entries}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp, self.index_path)
+
+
+def find_gaps(
+    library: LibraryIndex,
+    albums: List[Dict[str, str]],
+    get_tracks: Callable[[str], List[Dict[str, str]]],
+    artist: Optional[str] = None,
+) -> List[Tuple[Dict[str, str], List[Dict[str, str]], bool]]:
+    """
+    Compare an artist's releases with the library.
+    Returns (album, missing tracks, whole album missing) for every incomplete album.
+    """
+    gaps = []
+    for album in albums:
+        tracks = get_tracks(album["url"])
+        if not library.owns_album(album["title"]):
+            gaps.append((album, tracks, True))
+            continue
+
+        missing = [t for t in tracks if not library.owns_track(album["title"], t["title"], artist)]
+        if missing:
+            gaps.append((album, missing, False))
+    return gaps
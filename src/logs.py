@@ -0,0 +1,62 @@
+import os
+import json
+import queue
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+LogRecord = Dict[str, Any]
+
+# Lowest to highest; used for filtering
+LEVELS = {"info": 20, "warn": 30, "error": 40}
+
+
+def make_record(level: str, message: str, **fields: Any) -> LogRecord:
+    return {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "level": level,
+        "msg": message,
+        **fields,
+    }
+
+
+class LogSink:
+    """
+    Streams structured log records to a JSON lines file from a background thread.
+
+    write() only enqueues, so workers never wait on disk. Records are written
+    in batches and flushed whenever the queue runs dry.
+    """
+
+    _STOP = object()
+
+    def __init__(self, path: Optional[str] = None):
+        if path is None:
+            path = f"~/.cache/riff/logs/riff-{datetime.now():%Y-%m-%d}.jsonl"
+        self.path = os.path.expanduser(path)
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def write(self, record: LogRecord) -> None:
+        self._queue.put(record)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Flush what is queued and stop the writer."""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                item = self._queue.get()
+                while item is not self._STOP:
+                    f.write(json.dumps(item, ensure_ascii=False, default=str) + "\n")
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                f.flush()
+                if item is self._STOP:
+                    return
@@ -1,74 +1,209 @@
 import json
 import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from urllib.parse import quote
 from cache import Cache
+from throttle import CircuitBreaker, HostLimit, get_breaker
+import tracing
+from utils import lyrics_key
 
-class LyricsDownloader:
-    """Fetches lyrics from MusixMatch API."""
-    def __init__(self, artist: str, title: str, download_path: str, use_old: bool = False, fallback: bool = True):
-        if not title or not artist or not download_path:
-            raise ValueError("Missing required parameters")
-        self.artist = artist
-        self.title = title
-        self.download_path = download_path
-        if not use_old:
-            self.token = self._load_or_fetch_token()
-        self.cache = Cache("~/.cache/riff/lyrics.cache", ttl=60 * 60 * 24 * 7)
-        self.ROOT_URL = "https://apic-desktop.musixmatch.com/ws/1.1/"
-        self.session = requests.Session()
-        self.session.headers.update({
+MUSIXMATCH_ROOT = "https://apic-desktop.musixmatch.com/ws/1.1/"
+GENIUS_ROOT = "https://genius.com/"
+APP_ID = "web-desktop-app-v1.0"
+
+BROWSER_UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+class LyricsClient:
+    """
+    Long-lived lyrics client shared by every track of a session.
+
+    Owns one pooled keep-alive session per provider and the Musixmatch user
+    token, which is cached on disk and refreshed on expiry by a single thread.
+    """
+
+    def __init__(
+        self,
+        musixmatch_root: str = MUSIXMATCH_ROOT,
+        genius_root: str = GENIUS_ROOT,
+        timeouts: Optional[Dict[str, float]] = None,
+        pool_size: int = 8,
+        cache: Optional[Cache] = None,
+        limits: Optional[Dict[str, HostLimit]] = None,
+        breakers: Optional[Dict[str, CircuitBreaker]] = None,
+        hit_ttl: int = 60 * 60 * 24 * 30,  # 30 days
+        miss_ttl: int = 60 * 60 * 24,  # 1 day
+    ):
+        self.musixmatch_root = musixmatch_root
+        self.genius_root = genius_root
+        self.timeouts = {"musixmatch": 10.0, "genius": 10.0, **(timeouts or {})}
+        # Per-provider concurrency caps and request rates, to stay under their radar
+        self.limits = {
+            "musixmatch": HostLimit(concurrency=4, rate=8),
+            "genius": HostLimit(concurrency=4, rate=4),
+            **(limits or {}),
+        }
+        # Shared per-provider pauses after 429s or error bursts; lookups fail fast meanwhile
+        self.breakers = {
+            "musixmatch": get_breaker("musixmatch"),
+            "genius": get_breaker("genius"),
+            **(breakers or {}),
+        }
+        # Holds the token and fetched lyrics ("lyrics:<key>"), plus "not found"
+        # markers ("lyrics-miss:<key>") that expire sooner
+        self.cache = cache if cache is not None else Cache("~/.cache/riff/lyrics.cache", ttl=60 * 60 * 24 * 7, flush_interval=2)
+        self.hit_ttl = hit_ttl
+        self.miss_ttl = miss_ttl
+
+        self.musixmatch = self._session(pool_size, {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/109.0.0.0 Safari/537.36",
-            "Authority": "apic-desktop.musixmatch.com"
+            "Authority": "apic-desktop.musixmatch.com",
+        })
+        self.genius = self._session(pool_size, {
+            "User-Agent": BROWSER_UA,
+            "Referer": "https://genius.com/",
+            "Origin": "https://genius.com",
         })
-        self.lyrics: dict = {}
 
-    def _load_or_fetch_token(self):
-            """Manages token caching and refreshing."""
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
 
-            cachedToken = self.cache.get("token")
-            if cachedToken:
-                data = json.loads(cachedToken)
-                if data['expires_at'] > time.time():
-                    return data['token']
+    @staticmethod
+    def _session(pool_size: int, headers: Dict[str, str]) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(headers)
+        return session
 
-            params = {"app_id": "web-desktop-app-v1.0", "user_language": "en", "t": int(time.time() * 1000)}
-            res = self.session.get(f"{self.ROOT_URL}token.get", params=params).json()
-            
-            token = res["message"]["body"]["user_token"]
+    def _get(self, provider: str, url: str, **kwargs) -> requests.Response:
+        session = self.musixmatch if provider == "musixmatch" else self.genius
+        breaker = self.breakers[provider]
+        breaker.check()
+        try:
+            with self.limits[provider]:
+                res = session.get(url, timeout=self.timeouts[provider], **kwargs)
+        except requests.RequestException:
+            breaker.failure()
+            raise
 
+        if res.status_code == 429 or res.status_code >= 500:
+            breaker.failure(throttled=res.status_code == 429)
+        else:
+            breaker.success()
+        return res
+
+    # -------------------------
+    # Musixmatch
+    # -------------------------
+    def token(self, refresh: bool = False) -> str:
+        """Return a valid Musixmatch user token, fetching a new one when expired."""
+        if not refresh and self._token and self._token_expires_at > time.time():
+            return self._token
+
+        with self._token_lock:
+            # Another thread may have refreshed it while we waited
+            if not refresh and self._token and self._token_expires_at > time.time():
+                return self._token
+
+            if not refresh:
+                cached = self.cache.get("token")
+                if cached:
+                    data = json.loads(cached)
+                    if data["expires_at"] > time.time():
+                        self._token, self._token_expires_at = data["token"], data["expires_at"]
+                        return self._token
+
+            params = {"app_id": APP_ID, "user_language": "en", "t": int(time.time() * 1000)}
+            res = self._get("musixmatch", f"{self.musixmatch_root}token.get", params=params).json()
+
+            self._token = res["message"]["body"]["user_token"]
+            self._token_expires_at = time.time() + 600
             self.cache.set("token", json.dumps({
-                "token": token,
-                "expires_at": time.time() + 600
+                "token": self._token,
+                "expires_at": self._token_expires_at,
             }))
-            return token
+            return self._token
+
+    def _musixmatch_get(self, method: str, params: dict) -> dict:
+        """Call a Musixmatch method, renewing the token once if it was rejected."""
+        for attempt in range(2):
+            query = {**params, "usertoken": self.token(refresh=attempt > 0), "app_id": APP_ID}
+            res = self._get("musixmatch", f"{self.musixmatch_root}{method}", params=query).json()
+            if res["message"]["header"].get("status_code") != 401:
+                break
+        return res
+
+    def get_synced_lyrics(self, artist: str, title: str) -> dict:
+        if not title or not artist:
+            return {
+                "status": 400,
+                "message": "Song title and artist name are required!",
+            }
 
+        search_res = self._musixmatch_get("track.search", {
+            "q_track": title,
+            "q_artist": artist,
+            "f_has_lyrics": 1,
+        })
+        body = search_res["message"]["body"]
+        tracks = body.get("track_list", []) if isinstance(body, dict) else []
+
+        if not tracks:
+            return {
+                "status": 404,
+                "message": f"No lyrics found for '{title}' by {artist}",
+            }
+
+        track_id = tracks[0]["track"]["track_id"]
+
+        lrc_res = self._musixmatch_get("track.subtitle.get", {
+            "track_id": track_id,
+            "subtitle_format": "lrc",
+        })
+        body = lrc_res["message"]["body"]
+        if not isinstance(body, dict) or not body.get("subtitle"):
+            return {
+                "status": 404,
+                "message": f"No synced lyrics for '{title}' by {artist}",
+            }
+
+        return {
+            "status": 200,
+            "lyrics": body["subtitle"]["subtitle_body"],
+        }
+
+    # -------------------------
+    # Genius
+    # -------------------------
     def fetch_lyrics_metadata(self, search_term: str) -> dict:
         try:
             url = (
-                "https://genius.com/api/search/multi"
+                f"{self.genius_root}api/search/multi"
                 f"?per_page=1&q={quote(search_term)}"
             )
 
-            headers = {
-                "Accept": "application/json",
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                ),
-                "Referer": "https://genius.com/",
-                "Origin": "https://genius.com",
-            }
-
-            r = requests.get(url, headers=headers, timeout=10)
+            r = self._get("genius", url, headers={"Accept": "application/json"})
             r.raise_for_status()
             data = r.json()
 
             sections = data.get("response", {}).get("sections", [])
             if len(sections) < 2 or not sections[1].get("hits"):
-                return {"status": 500, "message": "Song not found"}
+                return {"status": 404, "message": "Song not found"}
 
             result = sections[1]["hits"][0]["result"]
 
@@ -84,7 +219,6 @@ class LyricsDownloader:
         except Exception as e:
             return {"status": 500, "message": str(e)}
 
-
     def get_lyrics_legacy(self, query: str) -> dict:
         if not query:
             return {
@@ -98,31 +232,12 @@ class LyricsDownloader:
             return res
 
         try:
-            headers = {
-                "Accept": "text/html,application/xhtml+xml",
-                "User-Agent": (
-                    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                    "AppleWebKit/537.36 (KHTML, like Gecko) "
-                    "Chrome/120.0.0.0 Safari/537.36"
-                ),
-            }
-
-            html = requests.get(res["url"], headers=headers, timeout=10).text
-            soup = BeautifulSoup(html, "html.parser")
-
-            containers = soup.select("[data-lyrics-container]")
-            lyrics_blocks = []
-
-            for c in containers:
-                for br in c.find_all("br"):
-                    br.replace_with("\n")
-                lyrics_blocks.append(c.get_text())
-
-            lyrics = "\n".join(lyrics_blocks).strip()
+            html = self._get("genius", res["url"], headers={"Accept": "text/html,application/xhtml+xml"}).text
+            lyrics = extract_genius_lyrics(html)
 
             if not lyrics:
                 return {
-                    "status": 500,
+                    "status": 404,
                     "message": f"Unable to find song: {query}",
                 }
 
@@ -142,66 +257,198 @@ class LyricsDownloader:
                 "message": str(e),
             }
 
-    def get_synced_lyrics(self) -> dict:
+    # -------------------------
+    # Both
+    # -------------------------
+    def get_lyrics(
+        self,
+        artist: str,
+        title: str,
+        use_old: bool = False,
+        fallback: bool = True,
+        duration: Optional[float] = None,
+    ) -> dict:
+        """
+        Synced lyrics from Musixmatch, falling back to plain Genius lyrics.
+        Results and "not found" answers are cached by normalized artist,
+        title and duration, so repeated lookups never touch the network.
+        """
+        key = lyrics_key(artist, title, duration)
+        cached = self.cache.get(f"lyrics:{key}", ttl=self.hit_ttl)
+        if cached is not None:
+            return cached
+        missed = self.cache.get(f"lyrics-miss:{key}", ttl=self.miss_ttl)
+        if missed is not None:
+            return missed
 
-        if not time or not self.artist:
-            return {
-                "status": 400,
-                "message": "Song title and artist name are required!",
-            }
+        res = self._fetch_lyrics(artist, title, use_old, fallback)
 
-        search_params = {
-            "q_track":  self.title,
-            "q_artist": self.artist,
-            "f_has_lyrics": 1,
-            "usertoken": self.token,
-            "app_id": "web-desktop-app-v1.0"
-        }
-        
-        search_res = self.session.get(f"{self.ROOT_URL}track.search", params=search_params).json()
-        tracks = search_res["message"]["body"].get("track_list", [])
+        if res.get("status") == 200:
+            self.cache.set(f"lyrics:{key}", res)
+        elif res.get("status") == 404:
+            self.cache.set(f"lyrics-miss:{key}", res)
+        return res
 
-        if not tracks:
-            return {
-                "status": 404,
-                "message": f"No lyrics found for '{self.title}' by {self.artist}",
-            }
+    def _fetch_lyrics(self, artist: str, title: str, use_old: bool, fallback: bool) -> dict:
+        query = f"{title} {artist}" if artist else title
 
-        track_id = tracks[0]["track"]["track_id"]
-            
-        lrc_params = {
-            "track_id": track_id,
-            "subtitle_format": "lrc",
-            "usertoken": self.token,
-            "app_id": "web-desktop-app-v1.0"
-        }
-        
-        lrc_res = self.session.get(f"{self.ROOT_URL}track.subtitle.get", params=lrc_params).json()
-        lrc_content = lrc_res["message"]["body"]["subtitle"]["subtitle_body"]
+        if use_old:
+            return self.get_lyrics_legacy(query)
+
+        try:
+            lyrcs = self.get_synced_lyrics(artist, title)
+        except Exception as e:
+            lyrcs = {"status": 500, "message": str(e)}
+
+        if lyrcs.get("status") == 200:
+            return {**lyrcs, "synced": True}
+        if fallback:
+            legacy = self.get_lyrics_legacy(query)
+            if legacy.get("status") == 404 and lyrcs.get("status") != 404:
+                # Musixmatch errored, so this is not a conclusive "not found"
+                return {"status": 500, "message": lyrcs.get("message")}
+            return legacy
+        return lyrcs
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _LyricsContainerParser(HTMLParser):
+    """Collects the text of [data-lyrics-container] elements, turning <br> into newlines."""
+
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self, expected: int):
+        super().__init__(convert_charrefs=True)
+        self.blocks: List[str] = []
+        self.expected = expected  # containers left to see before we can stop
+        self.depth = 0
+        self._buf: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.depth:
+            if tag == "br":
+                self._buf.append("\n")
+            elif tag not in self.VOID_TAGS:
+                self.depth += 1
+        elif tag not in self.VOID_TAGS and any(name == "data-lyrics-container" for name, _ in attrs):
+            self.depth = 1
+            self._buf = []
+            self.expected -= 1
+
+    def handle_startendtag(self, tag, attrs):
+        if self.depth and tag == "br":
+            self._buf.append("\n")
+
+    def handle_endtag(self, tag):
+        if not self.depth or tag in self.VOID_TAGS:
+            return
+        self.depth -= 1
+        if self.depth == 0:
+            self.blocks.append("".join(self._buf))
+            if self.expected <= 0:
+                raise _StopParsing
+
+    def handle_data(self, data):
+        if self.depth:
+            self._buf.append(data)
+
+
+def extract_genius_lyrics(html: str) -> str:
+    """
+    Extract lyrics from a Genius song page.
+
+    Skips straight to the first lyrics container and stops after the last one
+    instead of building a DOM for the whole page. Falls back to BeautifulSoup
+    if the markup confuses the streaming parser.
+    """
+    marker = "data-lyrics-container"
+    first = html.find(marker)
+    if first == -1:
+        return ""
+
+    parser = _LyricsContainerParser(expected=html.count(marker, first))
+    try:
+        parser.feed(html[html.rfind("<", 0, first):])
+        parser.close()
+    except _StopParsing:
+        pass
+    except Exception:
+        return _extract_genius_lyrics_bs4(html)
+
+    if parser.depth or not parser.blocks:
+        return _extract_genius_lyrics_bs4(html)
+    return "\n".join(parser.blocks).strip()
+
+
+def _extract_genius_lyrics_bs4(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+
+    containers = soup.select("[data-lyrics-container]")
+    lyrics_blocks = []
+
+    for c in containers:
+        for br in c.find_all("br"):
+            br.replace_with("\n")
+        lyrics_blocks.append(c.get_text())
+
+    return "\n".join(lyrics_blocks).strip()
+
+
+_client: Optional[LyricsClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> LyricsClient:
+    """Return the process-wide LyricsClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = LyricsClient()
+        return _client
+
+
+class LyricsDownloader:
+    """Fetches lyrics for one track through the shared LyricsClient."""
+    def __init__(
+        self,
+        artist: str,
+        title: str,
+        download_path,
+        use_old: bool = False,
+        fallback: bool = True,
+        client: Optional[LyricsClient] = None,
+        duration: Optional[float] = None,
+    ):
+        if not title or not artist or not download_path:
+            raise ValueError("Missing required parameters")
+        self.artist = artist
+        self.title = title
+        self.download_path = download_path
+        self.use_old = use_old
+        self.fallback = fallback
+        self.duration = duration
+        self.client = client or get_client()
+
+    @staticmethod
+    def fetch_lyrics_metadata(search_term: str) -> dict:
+        return get_client().fetch_lyrics_metadata(search_term)
+
+    def get_lyrics_legacy(self, query: str) -> dict:
+        return self.client.get_lyrics_legacy(query)
+
+    def get_synced_lyrics(self) -> dict:
+        return self.client.get_synced_lyrics(self.artist, self.title)
 
-        return {
-            "status": 200,
-            "lyrics": lrc_content,
-        }
-    
     def get_lyrics(self) -> dict:
-        if self.use_old:
-            return self.get_lyrics_legacy(self.title, f" by {self.artist}" if self.artist else "")
-        else:
-            lyrcs = self.get_synced_lyrics()
-            if lyrcs.get("status") == 200:
-                return lyrcs
-            else:
-                if self.fallback:
-                    return self.get_lyrics_legacy(self.title, f" by {self.artist}" if self.artist else "")
-                else:
-                    return {
-                        "status": 404,
-                        "message": f"No lyrics found for '{self.title}' by {self.artist}",
-                    }
-                
+        return self.client.get_lyrics(self.artist, self.title, self.use_old, self.fallback, self.duration)
+
     def download_lyrics(self) -> dict:
-        lyrics_data = self.get_lyrics()
+        with tracing.span("lyrics", title=self.title) as span:
+            lyrics_data = self.get_lyrics()
+            span.set(status=lyrics_data.get("status"))
 
         if lyrics_data.get("status") == 200:
             lyrics_file = self.download_path.with_suffix(".lrc")
@@ -210,6 +457,56 @@ class LyricsDownloader:
                 "status": 200,
                 "message": f"Lyrics saved: {lyrics_file.name}",
             }
-        
+
         return lyrics_data
-        
\ No newline at end of file
+
+
+class LyricsStage:
+    """
+    Album-level lyrics stage: fetches lyrics for many tracks concurrently and
+    writes each .lrc file as soon as its result arrives. Provider limits are
+    enforced by the shared client, so the pool size only bounds threads.
+
+    A lookup that failed while a provider was paused (see CircuitBreaker)
+    waits for the pause to end and is tried again, up to RETRIES_AFTER_PAUSE
+    times, instead of leaving the track without lyrics.
+    """
+
+    RETRIES_AFTER_PAUSE = 3
+
+    def __init__(
+        self,
+        client: Optional[LyricsClient] = None,
+        workers: int = 8,
+        on_result: Optional[Callable[[Path, dict], None]] = None,
+    ):
+        self.client = client or get_client()
+        self.on_result = on_result
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lyrics")
+
+    def submit(self, artist: str, title: str, download_path: Path, duration: Optional[float] = None) -> Future:
+        return self._pool.submit(self._fetch, artist, title, download_path, duration, tracing.current_job())
+
+    def close(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+    def _fetch(self, artist: str, title: str, download_path: Path, duration: Optional[float], job: Optional[str] = None) -> dict:
+        for attempt in range(self.RETRIES_AFTER_PAUSE + 1):
+            try:
+                with tracing.job(job):
+                    res = LyricsDownloader(
+                        artist, title, download_path, client=self.client, duration=duration
+                    ).download_lyrics()
+            except Exception as e:
+                res = {"status": 500, "message": str(e)}
+
+            # Errors are not cached, so the lookup can simply run again once the providers take requests
+            paused = [b for b in self.client.breakers.values() if b.state != "closed"]
+            if res.get("status") != 500 or not paused or attempt == self.RETRIES_AFTER_PAUSE:
+                break
+            for breaker in paused:
+                breaker.wait_ready()
+
+        if self.on_result:
+            self.on_result(download_path, res)
+        return res
@@ -1,15 +1,17 @@
 #!/usr/bin/env python3
 
 from pathlib import Path
+from typing import Any, Dict
 
-from src.tui.app import RiffApp
-from tui import RiffApp, DownloaderScreen
-from metadata import set_metadata
-from converter import convert_audio
+# Heavy modules (Textual, yt-dlp, mutagen, requests) are imported by the
+# commands that need them, so `riff --version` and `riff convert` start fast
+from throttle import parse_rate
 import argparse
 
 def metadata(args):
     """Apply metadata to a file or directory of files."""
+    from metadata import set_metadata
+
     if not args.input:
         print("Error: --input is required for metadata")
         return
@@ -39,6 +41,8 @@ def metadata(args):
 
 def convert(args):
     """Convert a file or directory of files to a target format in-place."""
+    from converter import convert_audio
+
     if not args.input:
         print("Error: --input is required for convert")
         return
@@ -63,6 +67,159 @@ def convert(args):
             file.unlink()
 
 
+def library(args):
+    """Scan the output directory and report what is missing from an artist's releases."""
+    from library import LibraryIndex, find_gaps
+
+    lib = LibraryIndex(args.output)
+    stats = lib.scan()
+    print(f"Library {lib.root}: {stats['files']} files ({stats['updated']} updated, {stats['removed']} removed)")
+
+    if not args.handle:
+        return
+
+    from client import get_remote
+
+    remote = get_remote()
+    if remote:
+        albums = list(remote.stream("artist_albums", handle=args.handle))
+
+        def get_album_tracks(url):
+            return remote.call("album_tracks", url=url)
+
+    else:
+        from downloader import get_artist_albums, get_album_tracks
+
+        albums = get_artist_albums(args.handle)
+    gaps = find_gaps(lib, albums, get_album_tracks, args.artist)
+    for album, missing, whole in gaps:
+        if whole:
+            print(f"Missing album: {album['title']} ({len(missing)} tracks)")
+        else:
+            print(f"Incomplete: {album['title']} ({len(missing)} missing)")
+            for t in missing:
+                print(f"    - {t['title']}")
+    print(f"{len(albums) - len(gaps)}/{len(albums)} releases complete")
+
+
+def sync(args):
+    """Download only the releases and tracks that appeared since the last sync of each handle."""
+    import time
+    from client import DaemonUnreachable, absolute_options, get_remote
+    from progress import ProgressAggregator
+
+    handles = args.handles or ([args.handle] if args.handle else [])
+    if not handles:
+        print("Error: give one or more handles (or --handle) to sync")
+        return
+
+    options = {
+        "recheck": args.recheck,
+        "mark_seen": args.mark_seen,
+        "target_format": args.format,
+        "cookies": args.cookies,
+        "download_lyrics": args.lyrics,
+        "dedupe": args.dedupe,
+        "max_connections": args.connections,
+        "download_workers": args.jobs,
+    }
+    progress = ProgressAggregator()
+    # Set up on first use: the remote limit once, the local state when running here
+    session: Dict[str, Any] = {}
+
+    def run_remote(remote, targets):
+        # riffd owns the sync state and runs the batch; we only submit and stream
+        try:
+            if args.limit_rate and not session.get("rate_sent"):
+                remote.call("settings", limit_rate=args.limit_rate)
+                session["rate_sent"] = True
+            batch = remote.call("sync", handles=targets, **absolute_options({**options, "output_dir": args.output}))
+        except DaemonUnreachable as e:
+            print(f"riffd is gone, syncing here instead: {e}")
+            return run_local(targets)
+        return remote.watch(batch, progress)
+
+    def run_local(targets):
+        if "state" not in session:
+            from sync import SyncState
+            from library import LibraryIndex
+            from pipeline import bandwidth
+            from logs import LogSink
+
+            bandwidth.set_rate(args.limit_rate)
+            session["state"], session["library"] = SyncState(), LibraryIndex(args.output)
+            progress.sink = LogSink()
+        from sync import run_sync
+
+        session["library"].scan()
+        return run_sync(targets, session["state"], session["library"], progress, **options)
+
+    # --artist only makes sense for a single handle
+    targets = {handle: args.artist if args.artist and len(handles) == 1 else handle for handle in handles}
+    while True:
+        # Asked every round: when riffd goes away, the next round runs here
+        remote = get_remote()
+        # All handles in one batch, so their downloads take turns (see pipeline.fair_order)
+        try:
+            if remote:
+                _run_with_echo(progress, run_remote, remote, targets)
+            else:
+                _run_with_echo(progress, run_local, targets)
+        except Exception as e:
+            print(f"Sync failed: {e}")
+
+        if not args.watch:
+            return
+        print(f"Next sync in {args.watch}s")
+        time.sleep(args.watch)
+
+
+def daemon(args):
+    """Run riffd in the foreground, or report on / stop a running one."""
+    from client import RiffClient
+
+    if args.action == "run":
+        from daemon import main as run_daemon
+
+        try:
+            run_daemon()
+        except RuntimeError as e:
+            print(f"Error: {e}")
+        return
+
+    info = RiffClient(timeout=5).ping()
+    if info is None:
+        print("riffd is not running")
+    elif args.action == "status":
+        print(f"riffd {info['pid']} up {info['uptime']:.0f}s, {info['running']} running and {info['queued']} queued batches")
+    else:
+        RiffClient(timeout=5).call("shutdown")
+        print(f"Stopped riffd {info['pid']}")
+
+
+def _run_with_echo(progress, fn, *args):
+    """Run fn while printing the progress log lines it produces."""
+    import threading
+
+    stop = threading.Event()
+
+    def echo():
+        while True:
+            done = stop.wait(0.5)
+            for record in progress.drain_events():
+                print(f"{record['ts'][11:19]} {record['level'].upper():<5} {record['msg']}")
+            if done:
+                return
+
+    printer = threading.Thread(target=echo, daemon=True)
+    printer.start()
+    try:
+        return fn(*args)
+    finally:
+        stop.set()
+        printer.join()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Discography downloader CLI")
     parser.add_argument("--version", action="store_true", help="Print the version and exit")
@@ -74,10 +231,33 @@ def main():
     parser.add_argument("--handle", type=str, help="YouTube artist handle")
     parser.add_argument("--cookies", type=str, help="Path to cookie file or browser name")
     parser.add_argument("--lyrics", type=bool, help="Download lyrics?", default=False) 
+    parser.add_argument("--dedupe", type=str, default="link", choices=["link", "copy", "off"],
+                        help="Download tracks shared by several releases once, then hardlink or copy them")
+    parser.add_argument("--connections", type=int, default=8,
+                        help="Most parallel connections for downloading long tracks (1 disables fragments)")
+    parser.add_argument("--jobs", type=int, default=3, help="Tracks to download at the same time")
+    parser.add_argument("--limit-rate", type=parse_rate, default=0, metavar="RATE",
+                        help="Total download bandwidth, e.g. 500K or 2M (default unlimited)")
+    parser.add_argument("--trace", type=str, metavar="FILE",
+                        help="Time each stage and write a Chrome trace (chrome://tracing, Perfetto) to FILE on exit")
+    parser.add_argument("--metrics-file", type=str, metavar="FILE",
+                        help="Keep Prometheus metrics in FILE (node_exporter textfile), updated every 15s and on exit")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Serve Prometheus metrics at http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--no-daemon", action="store_true", help="Work in this process even if riffd is running")
 
     subparsers = parser.add_subparsers(title="commands", dest="command")
     subparsers.add_parser("metadata", help="Apply metadata to files")
     subparsers.add_parser("convert", help="Convert files to another format")
+    subparsers.add_parser("library", help="Index the output directory and report missing releases of --handle")
+    sync_parser = subparsers.add_parser("sync", help="Download new releases of one or more handles since the last sync")
+    sync_parser.add_argument("handles", nargs="*", help="Handles to sync (default: --handle)")
+    sync_parser.add_argument("--watch", type=int, metavar="SECONDS", help="Keep running and sync again every SECONDS")
+    sync_parser.add_argument("--mark-seen", action="store_true", help="Record the current releases as seen without downloading")
+    sync_parser.add_argument("--recheck", type=int, metavar="N",
+                             help="Also look for new tracks in the N most recent known releases (default 3)")
+    daemon_parser = subparsers.add_parser("daemon", help="Run riffd, which shares caches and the download queue between riff sessions")
+    daemon_parser.add_argument("action", nargs="?", default="run", choices=["run", "status", "stop"])
 
     args = parser.parse_args()
 
@@ -85,12 +265,74 @@ def main():
         print("riff v1.1.0")
         return
 
+    if args.no_daemon:
+        from client import disable
+
+        disable()
+    if args.metrics_file or args.metrics_port:
+        import metrics
+
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+        if args.metrics_file:
+            metrics.export_periodically(args.metrics_file)
+    if args.trace:
+        import tracing
+
+        tracing.enable()
+
+    try:
+        run_command(args)
+    finally:
+        if args.trace:
+            tracing.write_chrome_trace(args.trace)
+            print(tracing.format_summary())
+            print(f"Trace written to {args.trace}")
+        if args.metrics_file:
+            metrics.write_textfile(args.metrics_file)
+
+
+def run_command(args):
+    """Run the chosen command, or the TUI when there is none."""
     if args.command == "metadata":
         metadata(args)
+        return
     elif args.command == "convert":
         convert(args)
+        return
+    elif args.command == "library":
+        library(args)
+        return
+    elif args.command == "sync":
+        sync(args)
+        return
+    elif args.command == "daemon":
+        daemon(args)
+        return
+
+    from client import get_remote
+    from pipeline import bandwidth
+    from tui import RiffApp
+
+    # Once for the session; the settings screen changes it from here on
+    bandwidth.set_rate(args.limit_rate)
+    remote = get_remote()  # look for riffd now rather than on the first request from the UI
+    if remote and args.limit_rate:
+        remote.call("settings", limit_rate=args.limit_rate)
 
-    RiffApp().run()
+    RiffApp(
+        handle=args.handle,
+        artist=args.artist or args.handle,
+        options={
+            "output_dir": args.output,
+            "target_format": args.format,
+            "cookies": args.cookies,
+            "download_lyrics": args.lyrics,
+            "dedupe": args.dedupe,
+            "max_connections": args.connections,
+            "download_workers": args.jobs,
+        },
+    ).run()
 
 
 if __name__ == "__main__":
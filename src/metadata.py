@@ -1,17 +1,20 @@
-from mutagen.easyid3 import EasyID3
-from mutagen.flac import FLAC
-from mutagen.mp4 import MP4
-from pathlib import Path
+from typing import Optional
 
 from mutagen.easyid3 import EasyID3
-from mutagen.flac import FLAC
-from mutagen.mp4 import MP4
+from mutagen.flac import FLAC, Picture
+from mutagen.id3 import ID3, APIC
+from mutagen.mp4 import MP4, MP4Cover
 from pathlib import Path
 
-def set_metadata(file_path, metadata: dict):
+import tracing
+
+
+@tracing.traced("tag")
+def set_metadata(file_path, metadata: dict, cover: Optional[bytes] = None):
     """
     Set metadata for a file safely.
     Converts all values to strings, skips None.
+    If cover is given (JPEG or PNG bytes) it is embedded as the front cover.
     """
     ext = Path(file_path).suffix.lower()[1:]  # remove dot
 
@@ -23,7 +26,6 @@ def set_metadata(file_path, metadata: dict):
             audio = EasyID3(file_path)
         except Exception:
             # If no ID3 header exists, create one
-            from mutagen.id3 import ID3
             audio = ID3()
             audio.save(file_path)
             audio = EasyID3(file_path)
@@ -32,10 +34,23 @@ def set_metadata(file_path, metadata: dict):
             audio[key] = value
         audio.save(v2_version=4)  # optional: v2.4.0
 
+        if cover:
+            tags = ID3(file_path)
+            tags.delall("APIC")
+            tags.add(APIC(encoding=3, mime=_image_mime(cover), type=3, desc="Cover", data=cover))
+            tags.save(v2_version=4)
+
     elif ext == "flac":
         audio = FLAC(file_path)
         for key, value in clean_metadata.items():
             audio[key] = value
+        if cover:
+            picture = Picture()
+            picture.type = 3
+            picture.mime = _image_mime(cover)
+            picture.data = cover
+            audio.clear_pictures()
+            audio.add_picture(picture)
         audio.save()
     elif ext in ("m4a", "mp4"):
         audio = MP4(file_path)
@@ -50,6 +65,13 @@ def set_metadata(file_path, metadata: dict):
         for k, v in clean_metadata.items():
             if k in mapping:
                 audio[mapping[k]] = v
+        if cover:
+            fmt = MP4Cover.FORMAT_PNG if _image_mime(cover) == "image/png" else MP4Cover.FORMAT_JPEG
+            audio["covr"] = [MP4Cover(cover, imageformat=fmt)]
         audio.save()
     else:
         print(f"Unsupported file type for metadata: {file_path}")
+
+
+def _image_mime(data: bytes) -> str:
+    return "image/png" if data.startswith(b"\x89PNG") else "image/jpeg"
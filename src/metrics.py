@@ -0,0 +1,185 @@
+"""
+Counters and gauges for monitoring headless and long-running runs.
+
+The download pipeline and the caches feed one process-wide registry.
+render() formats it in the Prometheus text format, which riff exposes as a
+textfile (for node_exporter's textfile collector, see write_textfile and
+export_periodically) or on a local HTTP /metrics endpoint (serve).
+"""
+
+import os
+import time
+import threading
+import weakref
+from typing import Any, Dict, Tuple
+
+# name -> (type, help, label names); metrics without labels are reported from the start
+METRICS: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {
+    "riff_tracks_downloaded_total": ("counter", "Tracks downloaded", ()),
+    "riff_tracks_converted_total": ("counter", "Tracks converted to the target format", ()),
+    "riff_tracks_tagged_total": ("counter", "Tracks tagged", ()),
+    "riff_lyrics_saved_total": ("counter", "Lyrics files written", ()),
+    "riff_download_bytes_total": ("counter", "Bytes downloaded", ()),
+    "riff_download_retries_total": ("counter", "Throttled downloads put back in the queue for another attempt", ()),
+    "riff_failures_total": ("counter", "Failures by stage", ("stage",)),
+    "riff_queue_depth": ("gauge", "Items waiting per stage", ("stage",)),
+    "riff_batch_last_finished_seconds": ("gauge", "Unix time the last batch finished", ()),
+    "riff_cache_requests_total": ("counter", "Cache lookups by cache and result", ("cache", "result")),
+    "riff_cache_hit_ratio": ("gauge", "Share of cache lookups that were hits", ("cache",)),
+    "riff_cache_entries": ("gauge", "Entries held per cache", ("cache",)),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_values: Dict[str, Dict[Labels, float]] = {
+    name: {} if label_names else {(): 0} for name, (_, _, label_names) in METRICS.items()
+}
+_lock = threading.Lock()
+_caches: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+def inc(name: str, amount: float = 1, **labels: Any) -> None:
+    """Add amount to a counter, or to a gauge (negative amounts allowed)."""
+    key = _labels(labels)
+    with _lock:
+        series = _values[name]
+        series[key] = series.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    with _lock:
+        _values[name][_labels(labels)] = value
+
+
+def value(name: str, **labels: Any) -> float:
+    with _lock:
+        return _values[name].get(_labels(labels), 0)
+
+
+def reset() -> None:
+    with _lock:
+        for name, (_, _, label_names) in METRICS.items():
+            _values[name] = {} if label_names else {(): 0}
+
+
+def mark_batch_finished() -> None:
+    set_gauge("riff_batch_last_finished_seconds", time.time())
+
+
+def track_cache(cache: Any) -> None:
+    """Report a Cache's hits, misses and size; it reports until it is garbage collected."""
+    _caches.add(cache)
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _collect_caches() -> Dict[str, Dict[Labels, float]]:
+    # Caches count on their own lock-held fields; they are summed here, per file name
+    stats: Dict[str, Dict[str, int]] = {}
+    for cache in list(_caches):
+        s = stats.setdefault(os.path.basename(cache.path), {"hits": 0, "misses": 0, "entries": 0})
+        s["hits"] += cache.hits
+        s["misses"] += cache.misses
+        s["entries"] += len(cache)
+
+    collected: Dict[str, Dict[Labels, float]] = {
+        "riff_cache_requests_total": {},
+        "riff_cache_hit_ratio": {},
+        "riff_cache_entries": {},
+    }
+    for name, s in stats.items():
+        lookups = s["hits"] + s["misses"]
+        collected["riff_cache_requests_total"][_labels({"cache": name, "result": "hit"})] = s["hits"]
+        collected["riff_cache_requests_total"][_labels({"cache": name, "result": "miss"})] = s["misses"]
+        collected["riff_cache_entries"][_labels({"cache": name})] = s["entries"]
+        if lookups:
+            collected["riff_cache_hit_ratio"][_labels({"cache": name})] = s["hits"] / lookups
+    return collected
+
+
+# -------------------------
+# Exposition
+# -------------------------
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(number: float) -> str:
+    # Full precision: byte counts and timestamps are too long for %g
+    return str(int(number)) if float(number).is_integer() else repr(float(number))
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        snapshot = {name: dict(series) for name, series in _values.items()}
+    snapshot.update(_collect_caches())
+
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        series = snapshot[name]
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, number in sorted(series.items()):
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            sample = f"{name}{{{label_text}}}" if labels else name
+            lines.append(f"{sample} {_number(number)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path: str) -> None:
+    """Write render() to path atomically, as node_exporter's textfile collector expects."""
+    path = os.path.expanduser(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+def export_periodically(path: str, interval: float = 15) -> threading.Event:
+    """Rewrite the textfile every interval seconds in the background; set the returned event to stop."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                write_textfile(path)
+            except OSError:
+                pass  # try again next time; the file keeps its last good contents
+
+    threading.Thread(target=loop, daemon=True, name="metrics-textfile").start()
+    return stop
+
+
+def serve(port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+    """Serve render() at http://host:port/metrics from a background thread."""
+    # Imported here: Cache imports this module, and most runs never serve
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
+
@@ -0,0 +1,505 @@
+import os
+import time
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from downloader import get_album_thumbnail
+from artwork import get_artwork
+from metadata import set_metadata
+from lyrics import LyricsDownloader, LyricsStage
+from converter import convert_audio
+from utils import extract_track_title, video_id
+from progress import ProgressAggregator
+from resolver import LookaheadResolver, is_expired_error
+from throttle import CircuitBreaker, FragmentTuner, RateLimiter, get_breaker, looks_throttled, looks_unreachable
+import metrics
+import tracing
+
+# (album {"title", "url", optional "artist"}, track number, track {"title", "url"})
+Job = Tuple[Dict[str, str], int, Dict[str, str]]
+
+# (downloaded file, its job, duration in seconds)
+Download = Tuple[Path, Job, Optional[float]]
+
+BROWSERS = {"chrome", "firefox", "edge", "safari", "opera"}
+
+# How a track that is on several selected releases reaches the other albums
+DEDUPE_MODES = ("link", "copy", "off")
+
+# Byte ranges requested per HTTP request (and per fragment of converted DASH formats)
+HTTP_CHUNK_SIZE = 10 * 1024 * 1024
+
+# Attempts per job when downloads fail because YouTube is throttling us
+MAX_ATTEMPTS = 4
+
+# Total download rate of the session in bytes/s, shared by every pipeline and
+# download thread; 0 is unlimited. Change it live with bandwidth.set_rate().
+bandwidth = RateLimiter(0)
+
+
+class DownloadPipeline:
+    """
+    Download → convert → tag → lyrics for a batch of jobs.
+
+    Has no UI of its own: everything is reported to a ProgressAggregator, so
+    the same pipeline runs behind the TUI and headless (e.g. `riff sync`).
+    Files go to output_dir/<album title>/.
+
+    Singles, EPs and deluxe editions often repeat an album's videos. With
+    dedupe "link" or "copy", each video id is downloaded and converted once
+    and the other albums get a hardlink ("link", sharing the first album's
+    tags) or a copy tagged for their own album. Hardlinks fall back to copies
+    where the filesystem refuses them.
+
+    Up to `download_workers` tracks download at once, taken round-robin
+    across artists and albums (see fair_order) so one big album does not
+    hold up the rest. Every downloaded chunk is paid for in the shared
+    `bandwidth` bucket, whose waiters are served in arrival order, so the
+    running downloads split the session's limit evenly.
+
+    All downloads go through the shared "youtube" CircuitBreaker. On 429s,
+    bot checks or a burst of network errors it pauses every worker, then
+    resumes with a single probe download. Jobs that failed because of
+    throttling are put back in the queue (up to MAX_ATTEMPTS) instead of
+    being dropped; other failures (unavailable or private videos) are not
+    retried and do not count against YouTube.
+    """
+
+    def __init__(
+        self,
+        output_dir,
+        target_format: str = "mp3",
+        artist: Optional[str] = None,
+        cookies: Optional[str] = None,
+        download_lyrics: bool = True,
+        progress: Optional[ProgressAggregator] = None,
+        dedupe: str = "link",
+        lookahead: int = 4,
+        max_connections: int = 8,
+        download_workers: int = 3,
+        limiter: Optional[RateLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        if dedupe not in DEDUPE_MODES:
+            raise ValueError(f"dedupe must be one of {DEDUPE_MODES}, not {dedupe!r}")
+
+        self.output_dir = Path(output_dir)
+        self.target_format = target_format
+        self.artist = artist
+        self.cookies = cookies
+        self.download_lyrics = download_lyrics
+        self.progress = progress or ProgressAggregator()
+        self.dedupe = dedupe
+        self.lookahead = lookahead
+        self.tuner = FragmentTuner(max_connections)
+        self.download_workers = max(1, download_workers)
+        self.bandwidth = limiter or bandwidth
+        self.breaker = breaker or get_breaker("youtube")
+
+        # Jobs of the last run that could not be downloaded, and those whose conversion or tagging failed
+        self.failed: List[Job] = []
+        self.failed_processing: List[Job] = []
+        # Video id -> the jobs of the last run riding along with its download
+        self._duplicates: Dict[str, List[Job]] = {}
+
+    def run(self, jobs: List[Job]) -> List[Path]:
+        """Process jobs (in a fair order); returns the paths of the finished files."""
+        progress = self.progress
+        self.failed = []
+        self.failed_processing = []
+        self._duplicates = {}
+
+        # Later jobs with an already queued video id ride along with the first one
+        if self.dedupe != "off":
+            unique: List[Job] = []
+            for job in jobs:
+                vid = video_id(job[2]["url"])
+                if vid in self._duplicates:
+                    self._duplicates[vid].append(job)
+                else:
+                    self._duplicates[vid] = []
+                    unique.append(job)
+            if len(unique) < len(jobs):
+                progress.log("info", f"{len(jobs) - len(unique)} tracks appear on several releases, downloading them once")
+            jobs = unique
+
+        # (job number, job, attempt)
+        queue = deque((idx, job, 1) for idx, job in enumerate(fair_order(jobs, self.artist), 1))
+        queue_lock = threading.Lock()
+        downloads: List[Download] = []
+        progress.start_batch(len(jobs))
+        metrics.set_gauge("riff_queue_depth", len(jobs), stage="download")
+
+        # Extraction and format selection for the next tracks run while the current ones download.
+        # "dashy" serves plain https formats as ranged fragments, which yt-dlp can fetch in parallel.
+        resolve_opts = {"format": "bestaudio/best", **self._cookie_opts()}
+        if self.tuner.max_connections > 1:
+            resolve_opts["extractor_args"] = {"youtube": {"formats": ["dashy"]}}
+        resolver = LookaheadResolver(resolve_opts, lookahead=self.lookahead)
+
+        def next_job() -> Optional[Tuple[int, Job, int]]:
+            with queue_lock:
+                if not queue:
+                    return None
+                # No lookahead while YouTube is refusing us; it would only add to the pile
+                if self.breaker.state == "closed":
+                    for _, upcoming, _ in list(queue)[:self.lookahead + 1]:
+                        resolver.prefetch(upcoming[2]["url"])
+                item = queue.popleft()
+                metrics.set_gauge("riff_queue_depth", len(queue), stage="download")
+                return item
+
+        def download_loop():
+            item = next_job()
+            while item is not None:
+                idx, job, attempt = item
+                album, track_no, track = job
+                if self.breaker.state != "closed":
+                    progress.set_message(f"YouTube paused, resuming in {self.breaker.remaining():.0f}s")
+                self.breaker.wait()
+
+                try:
+                    with tracing.job(video_id(track["url"])):
+                        downloaded = self._download(idx, job, len(jobs), resolver)
+                    self.breaker.success()
+                    if downloaded:
+                        downloads.append(downloaded)
+                        metrics.inc("riff_tracks_downloaded_total")
+                        metrics.inc("riff_queue_depth", stage="process")
+                        progress.mark_downloaded()
+                    else:
+                        progress.mark_skipped()
+                        progress.log("warn", f"Nothing downloaded for [{track_no}] {track['title']}{self._also_on(track)}",
+                                     stage="download", url=track["url"])
+                except Exception as e:
+                    throttled = looks_throttled(str(e))
+                    if throttled or looks_unreachable(str(e)):
+                        pause = self.breaker.failure(throttled)
+                        if pause:
+                            progress.log("warn", f"YouTube is refusing requests, pausing downloads for {pause:.0f}s", stage="download")
+                    else:
+                        # The video itself is the problem; it must not hold up the breaker as its probe
+                        self.breaker.release()
+
+                    if throttled and attempt < MAX_ATTEMPTS:
+                        with queue_lock:
+                            queue.appendleft((idx, job, attempt + 1))
+                            metrics.set_gauge("riff_queue_depth", len(queue), stage="download")
+                        metrics.inc("riff_download_retries_total")
+                        progress.log("warn", f"Requeued [{track_no}] {track['title']} (attempt {attempt}): {e}", stage="download", url=track["url"])
+                    else:
+                        self.failed.append(job)
+                        self.failed.extend(self._duplicates.get(video_id(track["url"]), []))
+                        progress.mark_failed()
+                        metrics.inc("riff_failures_total", stage="download")
+                        progress.log("error", f"DL Failed [{track_no}]{self._also_on(track)}: {e}", stage="download", url=track["url"])
+                finally:
+                    progress.finish_job(idx)
+                item = next_job()
+
+        # --- Phase 1: Download ---
+        with tracing.span("phase.download", jobs=len(jobs)):
+            with ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix="download") as pool:
+                for _ in range(min(self.download_workers, len(jobs)) or 1):
+                    pool.submit(download_loop)
+        resolver.close()
+
+        # --- Phase 2: Convert, Metadata & Lyrics ---
+        progress.set_message("Processing metadata & conversion...")
+        proc_total = len(downloads)
+        covers: Dict[Path, Optional[bytes]] = {}
+        finished: List[Path] = []
+        # Processed file -> its duplicates on other releases, which get a link or copy of its lyrics
+        lyrics_copies: Dict[Path, List[Path]] = {}
+
+        def on_lyrics(path: Path, res: dict):
+            metrics.inc("riff_queue_depth", -1, stage="lyrics")
+            copies = lyrics_copies.pop(path, [])
+            if res.get("status") == 200:
+                metrics.inc("riff_lyrics_saved_total")
+                progress.log("info", res.get("message"), stage="lyrics", file=str(path))
+                for dup_file in copies:
+                    try:
+                        self._place_lyrics(path.with_suffix(".lrc"), dup_file.with_suffix(".lrc"))
+                        metrics.inc("riff_lyrics_saved_total")
+                    except OSError as e:
+                        progress.log("warn", f"No lyrics for {dup_file.name}: {e}", stage="lyrics", file=str(dup_file))
+            else:
+                if res.get("status") != 404:
+                    metrics.inc("riff_failures_total", stage="lyrics")
+                progress.log("warn", f"No lyrics for {path.name}: {res.get('message')}", stage="lyrics", file=str(path))
+
+        # Lyrics are fetched concurrently for the whole selection while we keep processing
+        lyrics_stage = LyricsStage(on_result=on_lyrics) if self.download_lyrics else None
+
+        for file_path, job, duration in downloads:
+            album, _, track = job
+            artist = album.get("artist") or self.artist
+            with tracing.job(video_id(track["url"])), tracing.span("process", file=file_path.name):
+                try:
+                    current_file = file_path
+                    album_name = file_path.parent.name
+
+                    # 1. Conversion
+                    actual_ext = file_path.suffix.lstrip(".")
+                    if self.target_format.lower() != actual_ext.lower():
+                        progress.update_job(file_path, file_path.name, "convert")
+                        new_path_str = convert_audio(str(file_path), self.target_format, str(file_path.parent))
+                        file_path.unlink()
+                        current_file = Path(new_path_str)
+                        metrics.inc("riff_tracks_converted_total")
+                        progress.log("info", f"Converted: {current_file.name}", stage="convert", file=str(current_file))
+
+                    # 2. Metadata (cover fetched once per album)
+                    progress.update_job(file_path, current_file.name, "tag")
+                    if file_path.parent not in covers:
+                        with tracing.span("cover", album=album_name):
+                            covers[file_path.parent] = self._album_cover(artist, album_name, album["url"])
+                        if covers[file_path.parent] is None:
+                            progress.log("warn", f"No cover art for: {album_name}")
+
+                    track_no_str, title_str = extract_track_title(str(current_file), artist)
+                    tags = {
+                        "artist": artist,
+                        "album": album_name,
+                        "title": title_str.strip(),
+                        "tracknumber": track_no_str.strip(),
+                    }
+                    set_metadata(str(current_file), tags, cover=covers[file_path.parent])
+                    metrics.inc("riff_tracks_tagged_total")
+                    progress.log("info", f"Tags set: {current_file.name}", stage="tag", file=str(current_file))
+                    finished.append(current_file)
+                    copies = []
+
+                    # 3. Same track on other releases
+                    for dup_album, dup_no, _ in self._duplicates.get(video_id(track["url"]), []):
+                        dup_tags = {**tags, "album": dup_album["title"], "tracknumber": f"{dup_no:02d}"}
+                        with tracing.span("dedupe", mode=self.dedupe):
+                            dup_file = self._place_duplicate(current_file, dup_album, dup_no, dup_tags, covers)
+                        if dup_file:
+                            finished.append(dup_file)
+                            copies.append(dup_file)
+
+                    # 4. Lyrics, fetched once and placed next to the duplicates when they arrive
+                    if lyrics_stage:
+                        lyrics_copies[current_file] = copies
+                        metrics.inc("riff_queue_depth", stage="lyrics")
+                        lyrics_stage.submit(tags["artist"], tags["title"], current_file, duration)
+
+                except Exception as e:
+                    self.failed_processing.append(job)
+                    self.failed_processing.extend(self._duplicates.get(video_id(track["url"]), []))
+                    metrics.inc("riff_failures_total", stage="process")
+                    progress.log("error", f"Process error on {file_path.name}: {e}", stage="process", file=str(file_path))
+
+            metrics.inc("riff_queue_depth", -1, stage="process")
+            progress.finish_job(file_path)
+            progress.mark_processed()
+
+        if lyrics_stage:
+            progress.set_message("Waiting for lyrics...")
+            with tracing.span("lyrics.wait"):
+                lyrics_stage.close()
+
+        metrics.mark_batch_finished()
+        progress.set_message("All tasks complete! ✔")
+        progress.log("info", f"Processed {proc_total} tracks successfully.")
+        return finished
+
+    def _download(self, idx: int, job: Job, total: int, resolver: LookaheadResolver) -> Optional[Download]:
+        """Download one job with its resolved info; raises what yt-dlp raised."""
+        from yt_dlp import YoutubeDL
+
+        progress = self.progress
+        album, track_no, track = job
+        album_dir = self.output_dir / album["title"]
+        album_dir.mkdir(parents=True, exist_ok=True)
+        progress.set_message(f"Downloading {idx}/{total}")
+
+        # Bytes already charged to the session bandwidth limit
+        charged = [0]
+        charge_lock = threading.Lock()
+
+        def hook(d):
+            # Runs on every chunk: record state for the UI (which repaints on its own timer)
+            # and pay for the new bytes, which blocks this download while over the limit
+            if d["status"] == "downloading":
+                size = d.get("total_bytes") or d.get("total_bytes_estimate")
+                done = d.get("downloaded_bytes", 0)
+                fraction = done / size if size else None
+                progress.update_job(idx, track["title"], "download", fraction, d.get("speed"))
+                with charge_lock:
+                    new, charged[0] = done - charged[0], max(charged[0], done)
+                if new > 0:
+                    metrics.inc("riff_download_bytes_total", new)
+                    self.bandwidth.acquire(new)
+
+        progress.update_job(idx, track["title"], "resolve")
+        with tracing.span("resolve"):
+            info = resolver.get(track["url"])
+
+        # Long tracks get several connections, shared with whatever else is downloading
+        active = sum(1 for j in progress.jobs() if j["stage"] == "download") + 1
+        fragments = self.tuner.fragments_for(_expected_size(info), active)
+        ydl_opts = {
+            "format": "bestaudio/best",
+            "outtmpl": str(album_dir / f"{track_no:02d} - %(title)s.%(ext)s"),
+            "progress_hooks": [hook],
+            "quiet": True,
+            "noplaylist": True,
+            "ignoreerrors": False,
+            "http_chunk_size": HTTP_CHUNK_SIZE,
+            "concurrent_fragment_downloads": fragments,
+        }
+        ydl_opts.update(self._cookie_opts())
+
+        started = time.monotonic()
+        with YoutubeDL(ydl_opts) as ydl, tracing.span("download", connections=fragments):
+            try:
+                info = ydl.process_ie_result(info, download=True)
+            except Exception as e:
+                if not is_expired_error(e):
+                    raise
+                progress.log("warn", f"Format url expired, resolving again: {track['title']}", stage="download", url=track["url"])
+                info = ydl.process_ie_result(resolver.resolve(track["url"]), download=True)
+            if not info:
+                return None
+
+            final_filename = Path(ydl.prepare_filename(info))
+            if final_filename.exists():
+                self.tuner.report(fragments, final_filename.stat().st_size, time.monotonic() - started)
+            progress.log("info", f"Downloaded: {final_filename.name}", stage="download", url=track["url"], connections=fragments)
+            return final_filename, job, info.get("duration")
+
+    def _place_duplicate(
+        self,
+        source: Path,
+        album: Dict[str, str],
+        track_no: int,
+        tags: Dict[str, str],
+        covers: Dict[Path, Optional[bytes]],
+    ) -> Optional[Path]:
+        """
+        Put an already processed track into another album's directory, as a
+        hardlink or a retagged copy; None when the target is the source itself
+        (same album title and track number).
+        """
+        album_dir = self.output_dir / album["title"]
+        album_dir.mkdir(parents=True, exist_ok=True)
+        target = album_dir / f"{track_no:02d} - {source.name.split(' - ', 1)[-1]}"
+        if target == source or (target.exists() and os.path.samefile(target, source)):
+            return None
+        if target.exists():
+            target.unlink()
+
+        if self.dedupe == "link":
+            try:
+                os.link(source, target)
+                self.progress.log("info", f"Linked: {target}", stage="dedupe", file=str(target))
+                return target
+            except OSError:
+                # Other filesystem, or no hardlink support: copy instead
+                pass
+
+        shutil.copy2(source, target)
+        if album_dir not in covers:
+            covers[album_dir] = self._album_cover(tags["artist"], album["title"], album["url"])
+        set_metadata(str(target), tags, cover=covers[album_dir])
+        self.progress.log("info", f"Copied: {target}", stage="dedupe", file=str(target))
+        return target
+
+    def _place_lyrics(self, source: Path, target: Path) -> None:
+        """Give a duplicate the lyrics file of its source, linked like the track itself where possible."""
+        if not source.exists() or target == source or (target.exists() and os.path.samefile(target, source)):
+            return
+        if target.exists():
+            target.unlink()
+        if self.dedupe == "link":
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copy2(source, target)
+
+    def _also_on(self, track: Dict[str, str]) -> str:
+        # Duplicates share their source's outcome; say so where it is reported
+        count = len(self._duplicates.get(video_id(track["url"]), []))
+        return f" (also on {count} other releases)" if count else ""
+
+    def _cookie_opts(self) -> Dict[str, object]:
+        if not self.cookies:
+            return {}
+        if self.cookies.lower() in BROWSERS:
+            return {"cookies_from_browser": (self.cookies.lower(),)}
+        return {"cookiefile": self.cookies}
+
+    def _album_cover(self, artist: Optional[str], album_title: str, album_url: Optional[str]) -> Optional[bytes]:
+        """Album thumbnail from the playlist info, falling back to Genius artwork."""
+        thumbnail = None
+        try:
+            if album_url:
+                thumbnail = get_album_thumbnail(album_url)
+            if not thumbnail:
+                res = LyricsDownloader.fetch_lyrics_metadata(f"{artist} {album_title}")
+                if res.get("status") == 200:
+                    thumbnail = res.get("thumbnail")
+        except Exception:
+            return None
+        return get_artwork().get(thumbnail) if thumbnail else None
+
+
+def album_jobs(
+    album: Dict[str, str],
+    tracks: List[Dict[str, str]],
+    artist: Optional[str] = None,
+    numbers: Optional[List[int]] = None,
+) -> List[Job]:
+    """
+    Jobs for the given track numbers (1-based, all by default) of album.
+    The artist rides on the album, where fair_order and tagging look for it.
+    """
+    if artist:
+        album = {**album, "artist": artist}
+    if numbers is None:
+        numbers = list(range(1, len(tracks) + 1))
+    return [(album, i, tracks[i - 1]) for i in numbers]
+
+
+def fair_order(jobs: List[Job], default_artist: Optional[str] = None) -> List[Job]:
+    """
+    Interleave jobs round-robin: across artists first, then across each
+    artist's albums, keeping the track order within an album.
+    """
+    by_artist: Dict[Any, Dict[str, List[Job]]] = {}
+    for job in jobs:
+        artist = job[0].get("artist") or default_artist
+        by_artist.setdefault(artist, {}).setdefault(job[0]["url"], []).append(job)
+
+    per_artist = [_round_robin(list(albums.values())) for albums in by_artist.values()]
+    return _round_robin(per_artist)
+
+
+def _round_robin(groups: List[List[Job]]) -> List[Job]:
+    order = []
+    for i in range(max((len(g) for g in groups), default=0)):
+        order.extend(g[i] for g in groups if i < len(g))
+    return order
+
+
+def _expected_size(info: Dict[str, Any]) -> Optional[int]:
+    """Bytes the selected formats will take, from the reported or approximate size, or the bitrate."""
+    formats = info.get("requested_formats") or [info]
+    total = 0
+    for fmt in formats:
+        size = fmt.get("filesize") or fmt.get("filesize_approx")
+        if not size and fmt.get("tbr") and info.get("duration"):
+            size = fmt["tbr"] * 125 * info["duration"]  # kbit/s -> bytes
+        if not size:
+            return None
+        total += size
+    return int(total)
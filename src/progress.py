@@ -0,0 +1,146 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from logs import LogRecord, LogSink, make_record
+
+
+class ProgressAggregator:
+    """
+    Progress state shared by download workers and the UI.
+
+    Workers only assign into dicts, append to a deque (both atomic under the
+    GIL) or bump counters under a tiny lock, so reporting never blocks them
+    and never touches the UI. The UI reads a snapshot and drains queued log
+    events on its own timer (e.g. 10 Hz), however many progress ticks
+    happened in between.
+    """
+
+    def __init__(self, sink: Optional[LogSink] = None, max_events: Optional[int] = None):
+        self.sink = sink
+        self.message = "Idle"
+        self.total = 0  # jobs in the current batch
+        self.downloaded = 0
+        self.failed = 0
+        self.skipped = 0  # nothing to download, e.g. the file already exists
+        self.processed = 0
+        self.to_process = 0
+        self._jobs: Dict[Any, Dict[str, Any]] = {}
+        # Log records not drained yet; with max_events the oldest are dropped (the sink has them all)
+        self._events: Deque[LogRecord] = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    # -------------------------
+    # Writers (any thread)
+    # -------------------------
+    def start_batch(self, total: int) -> None:
+        self.total = total
+        self.downloaded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.processed = 0
+        self.to_process = 0
+        self._jobs = {}
+
+    def set_message(self, message: str) -> None:
+        self.message = message
+
+    def update_job(
+        self,
+        job_id: Any,
+        title: str,
+        stage: str,
+        fraction: Optional[float] = None,
+        speed: Optional[float] = None,
+    ) -> None:
+        self._jobs[job_id] = {
+            "title": title,
+            "stage": stage,
+            "fraction": fraction,
+            "speed": speed,
+        }
+
+    def finish_job(self, job_id: Any) -> None:
+        self._jobs.pop(job_id, None)
+
+    def mark_downloaded(self) -> None:
+        """A download finished; its file now waits for processing."""
+        with self._lock:
+            self.downloaded += 1
+            self.to_process += 1
+
+    def mark_skipped(self) -> None:
+        """A job ended without a download, so nothing waits for processing."""
+        with self._lock:
+            self.skipped += 1
+
+    def mark_failed(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def mark_processed(self) -> None:
+        with self._lock:
+            self.processed += 1
+
+    def log(self, level: str, message: str, **fields: Any) -> None:
+        """Queue a log line for the UI and the file sink; level is "info", "warn" or "error"."""
+        record = make_record(level, message, **fields)
+        self._events.append(record)
+        if self.sink:
+            self.sink.write(record)
+
+    # -------------------------
+    # Readers (UI thread)
+    # -------------------------
+    def jobs(self) -> List[Dict[str, Any]]:
+        return list(self._jobs.copy().values())
+
+    def download_fraction(self) -> float:
+        """Finished downloads plus the partial progress of running ones."""
+        if not self.total:
+            return 0.0
+        partial = sum(j["fraction"] or 0.0 for j in self.jobs() if j["stage"] == "download")
+        return min(1.0, (self.downloaded + self.skipped + self.failed + partial) / self.total)
+
+    def process_fraction(self) -> float:
+        if not self.to_process:
+            return 0.0
+        return min(1.0, self.processed / self.to_process)
+
+    def drain_events(self, limit: int = 500) -> List[LogRecord]:
+        events = []
+        while self._events and len(events) < limit:
+            events.append(self._events.popleft())
+        return events
+
+    # -------------------------
+    # Mirroring (another process)
+    # -------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters, message and running jobs as plain JSON-able data."""
+        return {
+            "message": self.message,
+            "total": self.total,
+            "downloaded": self.downloaded,
+            "failed": self.failed,
+            "skipped": self.skipped,
+            "processed": self.processed,
+            "to_process": self.to_process,
+            "jobs": self.jobs(),
+        }
+
+    def apply(self, snapshot: Dict[str, Any], records: List[LogRecord] = ()) -> None:
+        """
+        Take over a snapshot() and log records from another aggregator, e.g.
+        one in riffd. Records are queued for the UI only; the process that
+        produced them already sent them to its sink.
+        """
+        self.message = snapshot["message"]
+        self.total = snapshot["total"]
+        self.downloaded = snapshot["downloaded"]
+        self.failed = snapshot["failed"]
+        self.skipped = snapshot["skipped"]
+        self.processed = snapshot["processed"]
+        self.to_process = snapshot["to_process"]
+        self._jobs = dict(enumerate(snapshot["jobs"]))
+        self._events.extend(records)
@@ -0,0 +1,95 @@
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import tracing
+from utils import video_id
+
+Info = Dict[str, Any]
+
+# Resolve again when the chosen format urls expire within this many seconds
+EXPIRY_MARGIN = 5 * 60
+
+
+class LookaheadResolver:
+    """
+    Runs yt-dlp's extraction for upcoming tracks (watch page, player JS,
+    format selection) on a small pool while earlier tracks download, so each
+    download can start moving bytes right away via ydl.process_ie_result().
+
+    Each pool thread keeps its own YoutubeDL, which also reuses the parsed
+    player code between tracks; close() closes them all, which saves their
+    cookie jars. Format urls carry an `expire=` timestamp; info that is
+    about to expire when it is picked up is resolved again.
+    """
+
+    def __init__(self, ydl_opts: Dict[str, Any], workers: int = 3, lookahead: int = 4):
+        self.ydl_opts = {**ydl_opts, "quiet": True, "noplaylist": True}
+        self.lookahead = lookahead
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolve")
+        self._pending: Dict[str, Future] = {}
+        self._local = threading.local()
+        self._instances: List[Any] = []  # every YoutubeDL created, for close()
+        self._lock = threading.Lock()
+
+    def prefetch(self, url: str) -> None:
+        """Start resolving url in the background, unless it already is."""
+        with self._lock:
+            if url not in self._pending:
+                self._pending[url] = self._pool.submit(self.resolve, url)
+
+    def get(self, url: str) -> Info:
+        """Info for url, from the lookahead if it was prefetched; raises what the extraction raised."""
+        with self._lock:
+            future = self._pending.pop(url, None)
+        try:
+            info = future.result() if future else self.resolve(url)
+        except Exception:
+            if future is None:
+                raise
+            # The prefetch may have run into a pause or a transient error; try once more now
+            info = self.resolve(url)
+        if _expires_soon(info):
+            info = self.resolve(url)
+        return info
+
+    def resolve(self, url: str) -> Info:
+        """Extract and select formats for url now, on the calling thread."""
+        ydl = getattr(self._local, "ydl", None)
+        if ydl is None:
+            from yt_dlp import YoutubeDL
+
+            ydl = self._local.ydl = YoutubeDL(self.ydl_opts)
+            with self._lock:
+                self._instances.append(ydl)
+        with tracing.job(video_id(url)), tracing.span("extract"):
+            return ydl.extract_info(url, download=False)
+
+    def close(self) -> None:
+        """Drop what is still queued, wait for extractions in flight, then close every YoutubeDL."""
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            ydl.close()
+
+
+def _expires_soon(info: Info, margin: float = EXPIRY_MARGIN) -> bool:
+    formats = info.get("requested_formats") or [info]
+    for fmt in formats:
+        expire = parse_qs(urlparse(fmt.get("url") or "").query).get("expire")
+        if expire and expire[0].isdigit() and int(expire[0]) - time.time() < margin:
+            return True
+    return False
+
+
+def is_expired_error(error: Exception) -> bool:
+    """True for download errors that a fresh format url may fix (expired or forbidden url)."""
+    message = str(error)
+    return "HTTP Error 403" in message or "HTTP Error 410" in message
@@ -0,0 +1,63 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Hashable, List, Set
+
+from utils import normalize
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """
+    Incremental trigram index for fuzzy matching of titles.
+
+    Entries can be added from any thread while the index is being queried.
+    A query only walks the posting lists of its own trigrams, so lookups stay
+    fast however many albums and tracks are loaded. Results rank exact
+    substring matches first, then by the share of query trigrams matched,
+    then by insertion order.
+    """
+
+    def __init__(self, min_overlap: float = 0.6):
+        self.min_overlap = min_overlap
+        self._lock = threading.Lock()
+        self._keys: List[Hashable] = []
+        self._texts: List[str] = []
+        self._grams: Dict[str, List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: Hashable, text: str) -> None:
+        norm = normalize(text)
+        with self._lock:
+            doc = len(self._keys)
+            self._keys.append(key)
+            self._texts.append(norm)
+            for gram in _trigrams(norm):
+                self._grams[gram].append(doc)
+
+    def search(self, query: str, limit: int = 100) -> List[Hashable]:
+        norm = normalize(query)
+        if not norm:
+            return []
+
+        grams = _trigrams(norm)
+        with self._lock:
+            hits: Dict[int, int] = defaultdict(int)
+            for gram in grams:
+                for doc in self._grams.get(gram, ()):
+                    hits[doc] += 1
+
+            needed = max(1, int(len(grams) * self.min_overlap))
+            scored = []
+            for doc, count in hits.items():
+                exact = norm in self._texts[doc]
+                if exact or count >= needed:
+                    scored.append((not exact, -count / len(grams), doc))
+
+            scored.sort()
+            return [self._keys[doc] for _, _, doc in scored[:limit]]
@@ -0,0 +1,154 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from cache import Cache
+from downloader import get_album_tracks, get_artist_albums
+from library import LibraryIndex
+from pipeline import DownloadPipeline, Job, album_jobs
+from progress import ProgressAggregator
+
+# Seen releases must not expire like the extraction cache does
+FOREVER = 60 * 60 * 24 * 365 * 100
+
+# Albums at the top of the releases page (the newest) are re-listed on every
+# sync, since new tracks tend to show up there (singles growing into EPs,
+# deluxe editions, ...)
+RECHECK_RECENT = 3
+
+AlbumState = Dict[str, Any]  # {"title": str, "tracks": [track urls], "complete": bool}
+
+
+class SyncState:
+    """
+    Last-seen releases per handle, kept in ~/.cache/riff/sync.cache.
+
+    For every album of a handle it remembers the track urls already
+    downloaded (or marked as seen) and whether the album was complete.
+    """
+
+    def __init__(self, path: str = "~/.cache/riff/sync.cache"):
+        self._cache = Cache(path, ttl=FOREVER)
+
+    def albums(self, handle: str) -> Dict[str, AlbumState]:
+        """Album url -> state; empty for a handle that was never synced."""
+        state = self._cache.get(f"handle:{handle}")
+        return state["albums"] if state else {}
+
+    def last_sync(self, handle: str) -> Optional[float]:
+        state = self._cache.get(f"handle:{handle}")
+        return state["synced_at"] if state else None
+
+    def record(self, handle: str, albums: Dict[str, AlbumState]) -> None:
+        self._cache.set(f"handle:{handle}", {"albums": albums, "synced_at": time.time()})
+
+
+class SyncPlan:
+    """What a sync of one handle found: the jobs to run and the state to record once they ran."""
+
+    def __init__(self, handle: str):
+        self.handle = handle
+        self.new_albums: List[Dict[str, str]] = []
+        self.jobs: List[Job] = []
+        self.skipped_owned = 0
+        self.albums: Dict[str, AlbumState] = {}
+
+    def seen(self, failed: Optional[List[Job]] = None) -> Dict[str, AlbumState]:
+        """Album state to record; tracks that failed (to download or to process) stay unseen so the next sync retries them."""
+        failed_urls = {track["url"] for _, _, track in failed or []}
+        if not failed_urls:
+            return self.albums
+
+        albums = {}
+        for url, state in self.albums.items():
+            tracks = [t for t in state["tracks"] if t not in failed_urls]
+            albums[url] = {**state, "tracks": tracks, "complete": state["complete"] and len(tracks) == len(state["tracks"])}
+        return albums
+
+
+def plan_sync(
+    handle: str,
+    state: SyncState,
+    library: Optional[LibraryIndex] = None,
+    artist: Optional[str] = None,
+    recheck: int = RECHECK_RECENT,
+) -> SyncPlan:
+    """
+    Diff a fresh extraction of the handle's releases against the last-seen state.
+
+    New albums are queued whole. Of the known albums, only the `recheck` most
+    recent ones and those left incomplete by a failed download are listed
+    again, and only their unseen tracks are queued. Tracks the library
+    already has are skipped.
+    """
+    plan = SyncPlan(handle)
+    seen = state.albums(handle)
+
+    for pos, album in enumerate(get_artist_albums(handle, refresh=True)):
+        known = seen.get(album["url"])
+        if known is not None and pos >= recheck and known["complete"]:
+            plan.albums[album["url"]] = known
+            continue
+
+        tracks = get_album_tracks(album["url"], refresh=True)
+        seen_tracks = set(known["tracks"]) if known else set()
+        if known is None:
+            plan.new_albums.append(album)
+
+        numbers = []
+        for i, track in enumerate(tracks, 1):
+            if track["url"] in seen_tracks:
+                continue
+            if library and library.owns_track(album["title"], track["title"], artist):
+                plan.skipped_owned += 1
+                continue
+            numbers.append(i)
+        plan.jobs.extend(album_jobs(album, tracks, artist, numbers))
+
+        plan.albums[album["url"]] = {
+            "title": album["title"],
+            "tracks": [t["url"] for t in tracks],
+            "complete": True,
+        }
+
+    return plan
+
+
+def run_sync(
+    handles: Dict[str, Optional[str]],
+    state: SyncState,
+    library: LibraryIndex,
+    progress: ProgressAggregator,
+    recheck: Optional[int] = None,
+    mark_seen: bool = False,
+    **pipeline_options: Any,
+) -> List[SyncPlan]:
+    """
+    Sync handles (handle -> artist) into library.root: plan each, download
+    all their new tracks as one batch, so fair_order interleaves the
+    artists, and record what was seen (tracks that failed to download or
+    process stay unseen). A handle that cannot be planned is logged and
+    left out. Reports through progress; pipeline_options go to
+    DownloadPipeline.
+    """
+    plans = []
+    for handle, artist in handles.items():
+        try:
+            plan = plan_sync(handle, state, library, artist, RECHECK_RECENT if recheck is None else recheck)
+        except Exception as e:
+            progress.log("error", f"[{handle}] Sync failed: {e}")
+            continue
+        progress.log("info", f"[{handle}] {len(plan.new_albums)} new releases, {len(plan.jobs)} new tracks "
+                             f"({plan.skipped_owned} already in library)")
+        plans.append(plan)
+
+    jobs = [job for plan in plans for job in plan.jobs]
+    failed: List[Job] = []
+    if jobs and not mark_seen:
+        pipeline = DownloadPipeline(library.root, progress=progress, **pipeline_options)
+        pipeline.run(jobs)
+        failed = pipeline.failed + pipeline.failed_processing
+        library.scan()
+
+    for plan in plans:
+        state.record(plan.handle, plan.seen(failed))
+    return plans
@@ -0,0 +1,304 @@
+import re
+import time
+import threading
+from typing import Dict, Optional
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_rate(text: str) -> float:
+    """Bytes per second from "500K", "2.5M", "1G" or a plain number; 0 means unlimited."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid rate: {text!r} (use e.g. 500K, 2M or 0 for unlimited)")
+    return float(match.group(1)) * _UNITS[match.group(2).upper()]
+
+
+def format_rate(rate: float) -> str:
+    if rate <= 0:
+        return "unlimited"
+    for unit in ("G", "M", "K"):
+        if rate >= _UNITS[unit]:
+            return f"{rate / _UNITS[unit]:g}{unit}/s"
+    return f"{rate:g}B/s"
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` units per second with bursts up to `burst`.
+
+    Callers that find the bucket empty reserve their tokens (the balance goes
+    negative) and sleep outside the lock, so waiters are served in arrival
+    order. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1.0)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+
+    def set_rate(self, rate: float, burst: Optional[float] = None) -> None:
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.burst = burst if burst is not None else max(rate, 1.0)
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self, amount: float = 1.0) -> None:
+        with self._lock:
+            if self.rate <= 0:
+                return
+            self._refill()
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class HostLimit:
+    """Caps concurrent requests to a host and paces them through a RateLimiter."""
+
+    def __init__(self, concurrency: int, rate: float, burst: Optional[float] = None):
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self.limiter = RateLimiter(rate, burst)
+
+    def __enter__(self):
+        self._slots.acquire()
+        try:
+            self.limiter.acquire()
+        except BaseException:
+            self._slots.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+        return False
+
+
+class FragmentTuner:
+    """
+    Chooses how many fragments of a track yt-dlp fetches in parallel.
+
+    A budget of `max_connections` is shared by the jobs downloading at the
+    same time. Within it, the level is hill-climbed on measured throughput:
+    the best level so far is doubled until doubling no longer gains `gain`
+    (10%) more, and the running averages let it settle back when the link
+    changes. Tracks smaller than `min_size` use a single connection.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 8,
+        min_size: int = 16 * 1024 * 1024,
+        start: int = 2,
+        gain: float = 1.1,
+    ):
+        self._lock = threading.Lock()
+        self.max_connections = max_connections
+        self.min_size = min_size
+        self.start = start
+        self.gain = gain
+        self._rates: Dict[int, float] = {}  # level -> average bytes/s
+
+    def fragments_for(self, size: Optional[int] = None, active_jobs: int = 1) -> int:
+        if size is not None and size < self.min_size:
+            return 1
+
+        cap = max(1, self.max_connections // max(1, active_jobs))
+        with self._lock:
+            if not self._rates:
+                return min(self.start, cap)
+            best = self._best()
+            if best * 2 <= cap and best * 2 not in self._rates:
+                return best * 2
+            return min(best, cap)
+
+    def _best(self) -> int:
+        # More connections only win when they are clearly faster
+        best = None
+        for level in sorted(self._rates):
+            if best is None or self._rates[level] > self._rates[best] * self.gain:
+                best = level
+        return best
+
+    def report(self, fragments: int, nbytes: int, seconds: float, alpha: float = 0.3) -> None:
+        """Record the throughput a download got with `fragments` connections."""
+        if seconds <= 0 or nbytes < self.min_size:
+            return
+        rate = nbytes / seconds
+        with self._lock:
+            old = self._rates.get(fragments)
+            self._rates[fragments] = rate if old is None else old + alpha * (rate - old)
+
+
+# Substrings of errors that mean the host is refusing us rather than the request being bad
+THROTTLE_SIGNS = (
+    "HTTP Error 429",
+    "Too Many Requests",
+    "Sign in to confirm you",
+    "not a bot",
+    "rate-limited",
+    "rate limit",
+)
+
+
+# Substrings of errors that mean the host could not be reached or broke down
+UNREACHABLE_SIGNS = (
+    "HTTP Error 500",
+    "HTTP Error 502",
+    "HTTP Error 503",
+    "HTTP Error 504",
+    "timed out",
+    "Connection reset",
+    "Connection refused",
+    "Connection aborted",
+    "Remote end closed connection",
+    "Network is unreachable",
+    "Temporary failure in name resolution",
+    "Name or service not known",
+)
+
+
+def looks_throttled(message: str) -> bool:
+    return any(sign.lower() in message.lower() for sign in THROTTLE_SIGNS)
+
+
+def looks_unreachable(message: str) -> bool:
+    return any(sign.lower() in message.lower() for sign in UNREACHABLE_SIGNS)
+
+
+class CircuitOpen(Exception):
+    """Raised by CircuitBreaker.check() while a host is paused."""
+
+
+class CircuitBreaker:
+    """
+    Pauses all traffic to a host, across threads, once it starts refusing us.
+
+    While closed, requests flow. A throttle signal (429, bot check) opens the
+    circuit at once, as do `threshold` failures in a row. While open, wait()
+    blocks and check() raises CircuitOpen until the cooldown is over; then a
+    single probe request is let through (half-open). Its success closes the
+    circuit, its failure opens it again with the cooldown doubled, up to
+    `max_cooldown`; failures of requests that started before the pause are
+    ignored. The probe is whichever thread wait() or check() let through. Every request let through must report success() or
+    failure(), or release() when its outcome says nothing about the host
+    (e.g. a video that no longer exists).
+    """
+
+    def __init__(self, name: str, threshold: int = 5, cooldown: float = 30, max_cooldown: float = 600):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.state = "closed"
+        self._failures = 0
+        self._trips = 0
+        self._reopen_at = 0.0
+        self._probing = False
+        self._probe: Optional[int] = None  # thread id of the probe
+        self._cond = threading.Condition()
+
+    def remaining(self) -> float:
+        """Seconds until the next probe, 0 when closed."""
+        return max(0.0, self._reopen_at - time.monotonic()) if self.state != "closed" else 0.0
+
+    def wait(self) -> None:
+        """Block until a request may go out (possibly as the probe)."""
+        with self._cond:
+            while True:
+                delay = self._admit()
+                if delay == 0:
+                    return
+                self._cond.wait(delay)
+
+    def wait_ready(self) -> None:
+        """Block until the circuit is closed or a probe may go out, without becoming the probe."""
+        with self._cond:
+            while self.state != "closed":
+                if self._probing:
+                    self._cond.wait(1.0)  # the probe's outcome decides
+                    continue
+                delay = self._reopen_at - time.monotonic()
+                if delay <= 0:
+                    return
+                self._cond.wait(delay)
+
+    def check(self) -> None:
+        """Like wait(), but raise CircuitOpen instead of blocking."""
+        with self._cond:
+            delay = self._admit()
+        if delay:
+            raise CircuitOpen(f"{self.name} paused after errors, retrying in {delay:.0f}s")
+
+    def success(self) -> None:
+        with self._cond:
+            self._failures = 0
+            if self.state != "closed":
+                self.state = "closed"
+                self._trips = 0
+                self._probing = False
+                self._probe = None
+                self._cond.notify_all()
+
+    def failure(self, throttled: bool = False) -> float:
+        """Record a failed request; returns the pause in seconds if this failure opened the circuit."""
+        with self._cond:
+            self._failures += 1
+            if self.state != "closed" and not (self._probing and self._probe == threading.get_ident()):
+                return 0.0  # a straggler from before the pause; only the probe decides
+            if self.state == "closed" and not throttled and self._failures < self.threshold:
+                return 0.0
+
+            self._trips += 1
+            pause = min(self.max_cooldown, self.cooldown * 2 ** (self._trips - 1))
+            self.state = "open"
+            self._probing = False
+            self._probe = None
+            self._reopen_at = time.monotonic() + pause
+            self._cond.notify_all()
+            return pause
+
+    def release(self) -> None:
+        """Record a request that failed for its own reasons; a probe hands its turn to the next request."""
+        with self._cond:
+            if self._probing and self._probe == threading.get_ident():
+                self._probing = False
+                self._probe = None
+                self._cond.notify_all()
+
+    def _admit(self) -> float:
+        # 0 lets the caller through; otherwise how long to wait before asking again
+        if self.state == "closed":
+            return 0.0
+        if self._probing:
+            return 1.0
+        delay = self._reopen_at - time.monotonic()
+        if delay > 0:
+            return delay
+        self.state = "half-open"
+        self._probing = True
+        self._probe = threading.get_ident()
+        return 0.0
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The process-wide breaker for a host (e.g. "youtube", "musixmatch"), shared by all workers."""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
@@ -0,0 +1,185 @@
+"""
+Timing spans for finding out where a batch spends its time.
+
+Tracing is off by default: span() then hands back one shared no-op context
+manager, so instrumented code pays a global lookup and nothing else.
+After enable(), each finished span is recorded in memory with its stage
+name, start, duration, thread and job (see job()). write_chrome_trace()
+saves them in the Chrome trace-event format (chrome://tracing or
+ui.perfetto.dev), and summary() gives per-stage percentiles.
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# (stage, start ns, duration ns, thread id, thread name, job, args)
+Span = Tuple[str, int, int, int, str, Optional[str], Dict[str, Any]]
+
+_enabled = False
+_spans: List[Span] = []
+_local = threading.local()
+
+
+def enable() -> None:
+    """Start recording spans, dropping any recorded before."""
+    global _enabled
+    _spans.clear()
+    _enabled = True
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def spans() -> List[Span]:
+    return list(_spans)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args: Any) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: Dict[str, Any]):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        thread = threading.current_thread()
+        # list.append is atomic, so worker threads need no lock here
+        _spans.append((self.name, self.start, duration, thread.ident, thread.name, current_job(), self.args))
+        return False
+
+    def set(self, **args: Any) -> None:
+        """Attach more details, e.g. a result only known at the end of the span."""
+        self.args.update(args)
+
+
+def span(name: str, **args: Any):
+    """Time the `with` block as stage `name`; args are shown with the span in the trace."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, args)
+
+
+def traced(name: str) -> Callable:
+    """Decorator form of span() for a whole function."""
+    def decorate(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def job(key: Optional[str]) -> Iterator[None]:
+    """Attribute the spans of this thread to job `key` (e.g. a video id) until the block ends."""
+    previous = getattr(_local, "job", None)
+    _local.job = key
+    try:
+        yield
+    finally:
+        _local.job = previous
+
+
+def current_job() -> Optional[str]:
+    """The job of this thread, to carry over to work handed to other threads."""
+    return getattr(_local, "job", None)
+
+
+# -------------------------
+# Export
+# -------------------------
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summary(recorded: Optional[List[Span]] = None) -> Dict[str, Dict[str, float]]:
+    """Per stage: count, total, p50, p95 and max duration in ms."""
+    by_stage: Dict[str, List[float]] = {}
+    for name, _, duration, *_ in _spans if recorded is None else recorded:
+        by_stage.setdefault(name, []).append(duration / 1e6)
+
+    stats = {}
+    for name, durations in by_stage.items():
+        durations.sort()
+        stats[name] = {
+            "count": len(durations),
+            "total_ms": sum(durations),
+            "p50_ms": _percentile(durations, 50),
+            "p95_ms": _percentile(durations, 95),
+            "max_ms": durations[-1],
+        }
+    return stats
+
+
+def format_summary(recorded: Optional[List[Span]] = None) -> str:
+    """summary() as a table, the stages taking the most time first."""
+    stats = summary(recorded)
+    lines = [f"{'stage':<16} {'count':>6} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"]
+    for name, s in sorted(stats.items(), key=lambda item: -item[1]["total_ms"]):
+        lines.append(
+            f"{name:<16} {s['count']:>6} {s['total_ms'] / 1000:>9.2f} "
+            f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['max_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def write_chrome_trace(path: str, recorded: Optional[List[Span]] = None) -> None:
+    """Save spans as Chrome trace events (one row per thread), with summary() under otherData."""
+    recorded = _spans[:] if recorded is None else recorded
+    origin = min((start for _, start, *_ in recorded), default=0)
+    events: List[Dict[str, Any]] = [{"ph": "M", "pid": 1, "name": "process_name", "args": {"name": "riff"}}]
+
+    threads: Dict[int, str] = {}
+    for name, start, duration, tid, thread_name, job_key, args in recorded:
+        threads.setdefault(tid, thread_name)
+        events.append({
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": (start - origin) / 1000,
+            "dur": duration / 1000,
+            "pid": 1,
+            "tid": tid,
+            "args": {"job": job_key, **args} if job_key else args,
+        })
+    for tid, thread_name in threads.items():
+        events.append({"ph": "M", "pid": 1, "tid": tid, "name": "thread_name", "args": {"name": thread_name}})
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "otherData": {"summary": summary(recorded)}}, f, default=str)
@@ -1,13 +1,17 @@
+from typing import Any, Dict, Optional
+
 from textual.app import App
 from .downloader import DownloaderScreen
 from .search import SearchScreen
 from .settings import SettingsScreen
 
 class RiffApp(App):
-    def __init__(self, handle=None, artist=None, **kwargs):
+    def __init__(self, handle=None, artist=None, options: Optional[Dict[str, Any]] = None, **kwargs):
         super().__init__(**kwargs)
         self.handle = handle
         self.artist = artist
+        # DownloaderScreen options from the CLI (output_dir, target_format, ...)
+        self.options = options or {}
 
     def on_mount(self):
         # Decide first screen
@@ -17,7 +21,7 @@ class RiffApp(App):
         else:
             # Directly go to downloader
             self.push_screen(
-                DownloaderScreen(handle=self.handle, artist=self.artist)
+                DownloaderScreen(handle=self.handle, artist=self.artist, **self.options)
             )
 
     def on_search_select(self, handle: str, artist: str):
@@ -25,4 +29,4 @@ class RiffApp(App):
         self.handle = handle
         self.artist = artist
         # Switch to downloader screen with selected artist
-        self.push_screen(DownloaderScreen(handle=handle, artist=artist))
+        self.push_screen(DownloaderScreen(handle=handle, artist=artist, **self.options))
@@ -1,112 +1,122 @@
 
-from typing import Optional, Dict, List
+from typing import Deque, Optional, Dict, List, Set, Tuple
 from pathlib import Path
+import asyncio
 import threading
+from collections import deque
 from datetime import datetime
 
 from textual.screen import Screen
 from textual.widgets import (
     Header,
     Footer,
-    ListView,
-    ListItem,
     Static,
     ProgressBar,
     RichLog,
+    Input,
 )
 from textual.containers import Horizontal, Vertical
 from textual.binding import Binding
+from rich.markup import escape
 
-from downloader import get_album_tracks, get_artist_albums
-from metadata import set_metadata
-from lyrics import LyricsDownloader, get_lyrics, get_synced_lyrics
-from converter import convert_audio
-from utils import extract_track_title
+import aio
+from client import DaemonError, DaemonUnreachable, absolute_options, get_remote
+from pipeline import DownloadPipeline, album_jobs, bandwidth
+from throttle import format_rate
+from progress import ProgressAggregator
+from search_index import SearchIndex
+from library import LibraryIndex
+from logs import LEVELS, LogSink
+
+from .virtual_list import VirtualList
+from .settings import SettingsScreen
 
 
 # -----------------------------
 # Logging
 # -----------------------------
 class AppLog(RichLog):
-    """Custom log widget with timestamping."""
+    """
+    Custom log widget with timestamping.
+
+    Keeps the last RING_SIZE records in a ring buffer, which is also the most
+    the view ever holds, and can be filtered down to warnings and errors.
+    """
+
+    RING_SIZE = 2000
+
+    STYLES = {
+        "info": "[bold cyan]INFO[/bold cyan] ",
+        "warn": "[bold yellow]WARN[/bold yellow] ",
+        "error": "[bold red]ERROR[/bold red]",
+    }
+
+    def __init__(self, **kwargs):
+        super().__init__(max_lines=self.RING_SIZE, **kwargs)
+        self.records: Deque[Tuple[str, str, str]] = deque(maxlen=self.RING_SIZE)
+        self.min_level = "info"
 
     def info(self, msg: str):
-        self.write(f"[bold cyan]INFO[/bold cyan]  [{self._ts()}] {msg}")
+        self.add("info", msg)
 
     def warn(self, msg: str):
-        self.write(f"[bold yellow]WARN[/bold yellow]  [{self._ts()}] {msg}")
+        self.add("warn", msg)
 
     def error(self, msg: str):
-        self.write(f"[bold red]ERROR[/bold red] [{self._ts()}] {msg}")
+        self.add("error", msg)
+
+    def add(self, level: str, msg: str, ts: Optional[str] = None):
+        record = (level, ts or self._ts(), msg)
+        self.records.append(record)
+        if LEVELS[level] >= LEVELS[self.min_level]:
+            self._write(record)
+
+    def set_min_level(self, level: str):
+        """Re-render the buffered records at or above level."""
+        self.min_level = level
+        self.clear()
+        for record in self.records:
+            if LEVELS[record[0]] >= LEVELS[level]:
+                self._write(record)
+
+    def _write(self, record: Tuple[str, str, str]):
+        level, ts, msg = record
+        self.write(f"{self.STYLES[level]} [{ts}] {escape(msg)}")
 
     def _ts(self) -> str:
         return datetime.now().strftime("%H:%M:%S")
 
 
-# -----------------------------
-# List items
-# -----------------------------
-class AlbumItem(ListItem):
-    def __init__(self, title: str, url: str):
-        super().__init__()
-        self.title = title
-        self.url = url
-        self.selected = False
-        self.label = Static()
-
-    def compose(self):
-        yield self.label
-
-    def on_mount(self):
-        self._update()
-
-    def _update(self):
-        self.label.update(("[✓] " if self.selected else "[ ] ") + self.title)
-
-    def toggle(self):
-        self.selected = not self.selected
-        self._update()
-
-
-class TrackItem(ListItem):
-    def __init__(self, index: int, title: str, url: str):
-        super().__init__()
-        self.index = index
-        self.title = title
-        self.url = url
-        self.selected = False
-        self.label = Static()
-
-    def compose(self):
-        yield self.label
-
-    def on_mount(self):
-        self._update()
-
-    def _update(self):
-        prefix = "[✓] " if self.selected else "[ ] "
-        self.label.update(f"{prefix}{self.index:02d}. {self.title}")
-
-    def toggle(self):
-        self.selected = not self.selected
-        self._update()
-
-
 # -----------------------------
 # Status widget
 # -----------------------------
 class DownloadStatus(Vertical):
     """Container for progress bars and status text."""
 
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Selector -> text last given to that Static
+        self._shown: Dict[str, str] = {}
+
     def compose(self):
         yield Static("Idle", id="status_text")
         yield Static("Download Progress")
         yield ProgressBar(total=100, id="dl_bar", show_eta=False)
         yield Static("Conversion Progress")
         yield ProgressBar(total=100, id="cv_bar", show_eta=False)
+        yield Static("", id="jobs_text")
 
     def update_msg(self, text: str):
-        self.query_one("#status_text", Static).update(text)
+        self._update_static("#status_text", text)
+
+    def update_jobs(self, text: str):
+        self._update_static("#jobs_text", text)
+
+    def _update_static(self, selector: str, text: str):
+        # Called at the repaint rate; skip the re-render when nothing changed
+        if self._shown.get(selector) != text:
+            self._shown[selector] = text
+            self.query_one(selector, Static).update(text)
 
     def update_dl(self, pct: float):
         self.query_one("#dl_bar", ProgressBar).progress = pct
@@ -126,9 +136,11 @@ class DownloaderScreen(Screen):
     .TopPane { height: 50%; }
     .BottomPane { height: 40%; }
 
-    ListView { width: 50%; border: solid $primary; }
+    VirtualList { width: 50%; height: 100%; border: solid $primary; }
     DownloadStatus { width: 40%; padding: 1; background: $surface; border: tall $primary; }
     AppLog { width: 60%; border: tall $primary; padding: 0 2; }
+    #find_input { dock: bottom; display: none; }
+    #find_input.-active { display: block; }
     """
 
     BINDINGS = [
@@ -136,9 +148,17 @@ class DownloaderScreen(Screen):
         Binding("ctrl+l", "focus_tracks", "Focus Tracks"),
         Binding("space", "toggle", "Select/Deselect"),
         Binding("d", "download", "Start Download"),
+        Binding("f", "toggle_failures", "Failures Only"),
+        Binding("s", "settings", "Settings"),
+        Binding("/", "find", "Search"),
+        Binding("n", "find_next", "Next Match"),
+        Binding("N", "find_previous", "Previous Match", show=False),
         Binding("q", "quit", "Quit"),
     ]
 
+    # Progress and log repaints per second, independent of worker activity
+    REPAINT_HZ = 10
+
     def __init__(
         self,
         handle,
@@ -147,6 +167,9 @@ class DownloaderScreen(Screen):
         target_format="mp3",
         cookies=None,
         download_lyrics=True,
+        dedupe="link",
+        max_connections=8,
+        download_workers=3,
     ):
         super().__init__()
         self.handle = handle
@@ -155,9 +178,28 @@ class DownloaderScreen(Screen):
         self.target_format = target_format
         self.cookies = cookies
 
+        # Plain data model behind the two lists; selection lives here, not on widgets
+        self.albums: List[Dict[str, str]] = []
         self.album_tracks: Dict[str, List[Dict[str, str]]] = {}
-        self.current_album: Optional[AlbumItem] = None
+        self.current_album: Optional[Dict[str, str]] = None
+        self.selected_albums: Set[str] = set()  # album urls
+        self.selected_tracks: Set[Tuple[str, int]] = set()  # (album url, track index)
         self.download_lyrics = download_lyrics
+        self.dedupe = dedupe
+        self.max_connections = max_connections
+        self.download_workers = download_workers
+
+        # What is already in output_dir, once scanned
+        self.library: Optional[LibraryIndex] = None
+
+        # Album and track titles, filled in as they load; "/" searches it
+        self.search_index = SearchIndex()
+        self._album_index: Dict[str, int] = {}  # album url -> row
+        self._matches: List[tuple] = []
+        self._match_pos = 0
+
+        # Written by background threads, painted by _repaint; full logs go to a JSON lines file
+        self.progress = ProgressAggregator(sink=LogSink())
 
     # -------------------------
     # UI
@@ -171,58 +213,247 @@ class DownloaderScreen(Screen):
             yield Static(cli_text)
 
         with Horizontal(classes="TopPane"):
-            yield ListView(id="album_list")
-            yield ListView(id="track_list")
+            yield VirtualList(self._album_row, id="album_list")
+            yield VirtualList(self._track_row, id="track_list")
 
         with Horizontal(classes="BottomPane"):
             yield DownloadStatus(id="status_area")
             yield AppLog(id="log_view", highlight=True, markup=True)
 
+        yield Input(placeholder="Search albums and tracks...", id="find_input")
         yield Footer()
 
     # -------------------------
     # Mount
     # -------------------------
     def on_mount(self):
-        # Load albums
-        self.albums = get_artist_albums(self.handle)
-        album_list = self.query_one("#album_list", ListView)
-        for a in self.albums:
-            album_list.append(AlbumItem(a["title"], a["url"]))
+        album_list = self.query_one("#album_list", VirtualList)
+        album_list.border_title = "Loading releases..."
         album_list.focus()
+        self.progress.set_message(f"Loading releases of @{self.handle}...")
+        self.set_interval(1 / self.REPAINT_HZ, self._repaint)
+
+        # Load albums and scan the local library off the UI thread; workers stop with the screen
+        self.run_worker(self._load_albums(), group="load")
+        threading.Thread(target=self._scan_library, daemon=True).start()
+
+    def _scan_library(self):
+        try:
+            library = LibraryIndex(str(self.output_dir))
+            stats = library.scan()
+        except Exception as e:
+            self.progress.log("warn", f"Library scan failed: {e}")
+            return
+
+        self.library = library
+        self.progress.log("info", f"Library: {stats['files']} files ({stats['updated']} updated, {stats['removed']} removed)")
+        self.app.call_from_thread(self._refresh_lists)
+
+    def _refresh_lists(self):
+        self.query_one("#album_list", VirtualList).refresh()
+        self.query_one("#track_list", VirtualList).refresh()
+
+    def on_unmount(self):
+        if self.progress.sink:
+            self.progress.sink.close()
+
+    async def _load_albums(self):
+        # Each album's tracks start preloading as soon as the album is known, 4 at a time
+        preload = asyncio.Semaphore(4)
+        tasks = []
+        try:
+            try:
+                async for album in aio.iter_artist_albums(self.handle):
+                    self._add_album(album)
+                    tasks.append(asyncio.create_task(self._preload_tracks(album, preload)))
+            except Exception as e:
+                self.progress.log("error", f"Failed loading releases: {e}")
+
+            self._albums_loaded()
+            await asyncio.gather(*tasks)
+        finally:
+            # Also when the worker is cancelled mid-listing: no preload may outlive the screen
+            for task in tasks:
+                task.cancel()
+        self.progress.set_message("Idle")
+
+    def _add_album(self, album: Dict[str, str]):
+        self._album_index[album["url"]] = len(self.albums)
+        self.albums.append(album)
+        self.search_index.add(("album", album["url"]), album["title"])
+        self.query_one("#album_list", VirtualList).set_count(len(self.albums))
+
+    def _albums_loaded(self):
+        self.query_one("#album_list", VirtualList).border_title = f"Releases ({len(self.albums)})"
+        self.progress.set_message("Preloading tracks...")
+
+    async def _preload_tracks(self, album: Dict[str, str], slots: asyncio.Semaphore):
+        try:
+            async with slots:
+                tracks = await aio.get_album_tracks(album["url"])
+            for i, t in enumerate(tracks, 1):
+                self.search_index.add(("track", album["url"], i), t["title"])
+            self.album_tracks[album["url"]] = tracks
+        except Exception:
+            self.album_tracks[album["url"]] = []
+            self.progress.log("warn", f"Failed preloading: {album['title']}")
+        if album is self.current_album:
+            self._show_tracks()
+
+    def _repaint(self):
+        """Paint the shared progress state; runs REPAINT_HZ times a second."""
+        status_area = self.query_one("#status_area", DownloadStatus)
+        log_view = self.query_one("#log_view", AppLog)
+        progress = self.progress
 
-        threading.Thread(target=self._preload_tracks, daemon=True).start()
+        for record in progress.drain_events():
+            log_view.add(record["level"], record["msg"], record["ts"][11:19])
 
-    def _preload_tracks(self):
-        log = self.query_one("#log_view", AppLog)
-        for album in self.albums:
-            try:
-                self.album_tracks[album["url"]] = get_album_tracks(album["url"])
-            except Exception:
-                self.album_tracks[album["url"]] = []
-                # Use call_later instead of call_from_thread
-                self.call_later(log.warn, f"Failed preloading: {album['title']}")
+        status_area.update_msg(progress.message)
+        status_area.update_dl(progress.download_fraction() * 100)
+        status_area.update_cv(progress.process_fraction() * 100)
+
+        lines = []
+        for job in progress.jobs()[:4]:
+            pct = f"{job['fraction'] * 100:3.0f}%" if job["fraction"] is not None else "    "
+            speed = f" {job['speed'] / 1024 / 1024:.1f}MB/s" if job["speed"] else ""
+            lines.append(f"{job['stage']:<8} {pct}{speed} {job['title']}")
+        status_area.update_jobs("\n".join(lines))
+
+    # -------------------------
+    # Rows
+    # -------------------------
+    def _album_row(self, index: int) -> str:
+        album = self.albums[index]
+        return ("[✓] " if album["url"] in self.selected_albums else "[ ] ") + self._owned_mark(album) + album["title"]
+
+    def _track_row(self, index: int) -> str:
+        url = self.current_album["url"]
+        track = self.album_tracks[url][index]
+        prefix = "[✓] " if (url, index + 1) in self.selected_tracks else "[ ] "
+        owned = self.library and self.library.owns_track(self.current_album["title"], track["title"], self.artist)
+        return f"{prefix}{'● ' if owned else '  '}{index + 1:02d}. {track['title']}"
+
+    def _owned_mark(self, album: Dict[str, str]) -> str:
+        """● when the library has the whole album, ◐ when only part of it."""
+        if not self.library or not self.library.owns_album(album["title"]):
+            return "  "
+        tracks = self.album_tracks.get(album["url"])
+        if tracks and all(self.library.owns_track(album["title"], t["title"], self.artist) for t in tracks):
+            return "● "
+        return "◐ "
+
+    def _show_tracks(self):
+        tracks = self.album_tracks.get(self.current_album["url"], []) if self.current_album else []
+        self.query_one("#track_list", VirtualList).set_count(len(tracks), reset=True)
 
     # -------------------------
     # Events & Actions
     # -------------------------
-    def on_list_view_highlighted(self, event):
-        if event.list_view.id == "album_list":
-            item = event.item
-            if isinstance(item, AlbumItem):
-                self.current_album = item
-                track_list = self.query_one("#track_list", ListView)
-                track_list.clear()
-                tracks = self.album_tracks.get(item.url, [])
-                for i, t in enumerate(tracks, 1):
-                    track_list.append(TrackItem(i, t["title"], t["url"]))
+    def on_virtual_list_highlighted(self, event: VirtualList.Highlighted):
+        if event.virtual_list.id == "album_list":
+            album = self.albums[event.index]
+            if album is not self.current_album:
+                self.current_album = album
+                self._show_tracks()
 
     def action_toggle(self):
-        if self.focused and hasattr(self.focused, "children"):
-            if isinstance(self.focused, ListView) and self.focused.index is not None:
-                item = self.focused.children[self.focused.index]
-                if hasattr(item, "toggle"):
-                    item.toggle()
+        focused = self.focused
+        if not isinstance(focused, VirtualList) or focused.index is None:
+            return
+
+        if focused.id == "album_list":
+            url = self.albums[focused.index]["url"]
+            self.selected_albums ^= {url}
+        elif self.current_album:
+            key = (self.current_album["url"], focused.index + 1)
+            self.selected_tracks ^= {key}
+        focused.refresh_row(focused.index)
+
+    def action_toggle_failures(self):
+        log_view = self.query_one("#log_view", AppLog)
+        log_view.set_min_level("info" if log_view.min_level == "warn" else "warn")
+        self.notify("Showing warnings and errors only" if log_view.min_level == "warn" else "Showing all logs")
+
+    # -------------------------
+    # Search ("/", "n", "N")
+    # -------------------------
+    def action_find(self):
+        find_input = self.query_one("#find_input", Input)
+        find_input.value = ""
+        find_input.add_class("-active")
+        find_input.focus()
+
+    def on_input_changed(self, event: Input.Changed):
+        if event.input.id == "find_input":
+            self._matches = self.search_index.search(event.value)
+            self._match_pos = 0
+            if self._matches:
+                self._jump_to(self._matches[0])
+
+    def on_input_submitted(self, event: Input.Submitted):
+        if event.input.id == "find_input":
+            self._close_find()
+            if not self._matches:
+                self.notify(f"No match for '{event.value}'", severity="warning")
+
+    def on_key(self, event):
+        if event.key == "escape" and self.focused is self.query_one("#find_input", Input):
+            self._close_find()
+            event.stop()
+
+    def action_find_next(self):
+        self._step_match(1)
+
+    def action_find_previous(self):
+        self._step_match(-1)
+
+    def _step_match(self, step: int):
+        if not self._matches:
+            self.notify("No search results, press / to search", severity="warning")
+            return
+        self._match_pos = (self._match_pos + step) % len(self._matches)
+        self._jump_to(self._matches[self._match_pos])
+
+    def _close_find(self):
+        self.query_one("#find_input", Input).remove_class("-active")
+        target = "#track_list" if self._matches and self._matches[self._match_pos][0] == "track" else "#album_list"
+        self.query_one(target, VirtualList).focus()
+
+    def _jump_to(self, match: tuple):
+        album_row = self._album_index.get(match[1])
+        if album_row is None:
+            return
+
+        self.current_album = self.albums[album_row]
+        self._show_tracks()
+        self.query_one("#album_list", VirtualList).move_cursor(album_row)
+        if match[0] == "track":
+            self.query_one("#track_list", VirtualList).move_cursor(match[2] - 1)
+
+    def action_settings(self):
+        settings = {
+            "limit_rate": bandwidth.rate,
+            "download_workers": self.download_workers,
+            "max_connections": self.max_connections,
+        }
+        self.app.push_screen(SettingsScreen(settings, on_save=self._apply_settings))
+
+    def _apply_settings(self, settings: dict):
+        bandwidth.set_rate(settings["limit_rate"])
+        remote = get_remote()
+        if remote:
+            # riffd does the downloading, and its limit is shared with its other clients
+            def send():
+                try:
+                    remote.call("settings", limit_rate=settings["limit_rate"])
+                except DaemonError as e:
+                    self.progress.log("warn", f"riffd: {e}")
+
+            threading.Thread(target=send, daemon=True).start()
+        self.download_workers = settings["download_workers"]
+        self.max_connections = settings["max_connections"]
+        self.notify(f"Bandwidth {format_rate(bandwidth.rate)}, {self.download_workers} parallel downloads")
 
     def action_focus_albums(self):
         self.query_one("#album_list").focus()
@@ -231,23 +462,23 @@ class DownloaderScreen(Screen):
         self.query_one("#track_list").focus()
 
     def action_download(self):
-        album_list = self.query_one("#album_list", ListView)
-        track_list = self.query_one("#track_list", ListView)
-        selected_albums = [a for a in album_list.children if getattr(a, "selected", False)]
         jobs = []
 
-        if selected_albums:
-            for album in selected_albums:
-                tracks = self.album_tracks.get(album.url, [])
-                for i, t in enumerate(tracks, 1):
-                    jobs.append((album, i, t))
+        if self.selected_albums:
+            for album in self.albums:
+                if album["url"] not in self.selected_albums:
+                    continue
+                jobs.extend(album_jobs(album, self.album_tracks.get(album["url"], []), self.artist))
         else:
-            selected_tracks = [t for t in track_list.children if getattr(t, "selected", False)]
-            if not selected_tracks:
+            if not self.selected_tracks:
                 self.notify("Select something first!", severity="error")
                 return
-            for t in selected_tracks:
-                jobs.append((self.current_album, t.index, {"title": t.title, "url": t.url}))
+            albums = {a["url"]: a for a in self.albums}
+            numbers: Dict[str, List[int]] = {}
+            for url, i in sorted(self.selected_tracks):
+                numbers.setdefault(url, []).append(i)
+            for url, album_numbers in numbers.items():
+                jobs.extend(album_jobs(albums[url], self.album_tracks[url], self.artist, album_numbers))
 
         threading.Thread(target=self.worker, args=(jobs,), daemon=True).start()
 
@@ -255,93 +486,33 @@ class DownloaderScreen(Screen):
     # Worker
     # -------------------------
     def worker(self, jobs: List[tuple]):
-        from yt_dlp import YoutubeDL
-
-        status_area = self.query_one("#status_area", DownloadStatus)
-        log_view = self.query_one("#log_view", AppLog)
-        downloaded_paths: List[Path] = []
-        total = len(jobs)
-
-        # --- Phase 1: Download ---
-        for idx, (album, track_no, track) in enumerate(jobs, 1):
-            album_dir = self.output_dir / album.title
-            album_dir.mkdir(parents=True, exist_ok=True)
-
-            def hook(d):
-                if d["status"] == "downloading":
-                    p_str = d.get("_percent_str", "0%").replace("%", "").strip()
-                    self.call_later(
-                        status_area.update_msg, f"Downloading: {track['title']} ({p_str}%)"
-                    )
-
-            ydl_opts = {
-                "format": "bestaudio/best",
-                "outtmpl": str(album_dir / f"{track_no:02d} - %(title)s.%(ext)s"),
-                "progress_hooks": [hook],
-                "quiet": True,
-                "noplaylist": True,
-                "ignoreerrors": False,
-            }
-
-            if self.cookies:
-                if self.cookies.lower() in {"chrome", "firefox", "edge", "safari", "opera"}:
-                    ydl_opts["cookies_from_browser"] = (self.cookies.lower(),)
-                else:
-                    ydl_opts["cookiefile"] = self.cookies
-
+        options = {
+            "target_format": self.target_format,
+            "artist": self.artist,
+            "cookies": self.cookies,
+            "download_lyrics": self.download_lyrics,
+            "dedupe": self.dedupe,
+            "max_connections": self.max_connections,
+            "download_workers": self.download_workers,
+        }
+        remote = get_remote()
+        if remote:
+            # riffd queues the batch behind other clients' work; we only mirror its progress
             try:
-                with YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(track["url"], download=True)
-                    if info:
-                        final_filename = Path(ydl.prepare_filename(info))
-                        downloaded_paths.append(final_filename)
-                        self.call_later(log_view.info, f"Downloaded: {final_filename.name}")
-                self.call_later(status_area.update_dl, (idx / total) * 100)
+                batch = remote.call("download", jobs=jobs, **absolute_options({**options, "output_dir": self.output_dir}))
+            except DaemonUnreachable as e:
+                self.progress.log("warn", f"riffd is gone, downloading here instead: {e}")
+                remote = None
             except Exception as e:
-                self.call_later(log_view.error, f"DL Failed [{track_no}]: {e}")
-
-        # --- Phase 2: Convert, Metadata & Lyrics ---
-        self.call_later(status_area.update_msg, "Processing metadata & conversion...")
-        proc_total = len(downloaded_paths)
-
-        for idx, file_path in enumerate(downloaded_paths, 1):
-            try:
-                current_file = file_path
-                album_name = file_path.parent.name
-
-                # 1. Conversion
-                actual_ext = file_path.suffix.lstrip(".")
-                if self.target_format.lower() != actual_ext.lower():
-                    self.call_later(status_area.update_msg, f"Converting: {file_path.name}")
-                    new_path_str = convert_audio(str(file_path), self.target_format, str(file_path.parent))
-                    file_path.unlink()
-                    current_file = Path(new_path_str)
-                    self.call_later(log_view.info, f"Converted: {current_file.name}")
-
-                # 2. Metadata
-                track_no_str, title_str = extract_track_title(str(current_file), self.artist)
-                tags = {
-                    "artist": self.artist,
-                    "album": album_name,
-                    "title": title_str.strip(),
-                    "tracknumber": track_no_str.strip(),
-                }
-                set_metadata(str(current_file), tags)
-                self.call_later(log_view.info, f"Tags set: {current_file.name}")
-
-                # 3. Lyrics
-                if self.download_lyrics:
-                    self.call_later(status_area.update_msg, f"Fetching lyrics: {title_str}")
-                    lyrics_downloader = LyricsDownloader(tags["artist"], tags["title"], current_file)
-                    lyrics_download_data = lyrics_downloader.download_lyrics()
-                    if lyrics_download_data.get("status") == 200:
-                        self.call_later(log_view.info, lyrics_download_data.get("message"))
-                    
-
-            except Exception as e:
-                self.call_later(log_view.error, f"Process error on {file_path.name}: {e}")
-
-            self.call_later(status_area.update_cv, (idx / proc_total) * 100)
-
-        self.call_later(status_area.update_msg, "All tasks complete! ✔")
-        self.call_later(log_view.info, f"Processed {proc_total} tracks successfully.")
+                self.progress.log("error", f"riffd: {e}")
+            else:
+                self.progress.log("info", f"Queued on riffd as batch {batch}")
+                try:
+                    remote.watch(batch, self.progress)
+                except Exception as e:
+                    self.progress.log("error", f"riffd: {e}")
+        if not remote:
+            DownloadPipeline(self.output_dir, progress=self.progress, **options).run(jobs)
+
+        # Pick up the new files so they show as owned
+        self._scan_library()
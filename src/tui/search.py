@@ -1,12 +1,13 @@
-from typing import Callable, List, Dict
+from typing import Callable, List, Dict, Optional
 from textual.screen import Screen
 from textual.widgets import Input, ListView, ListItem, Static
 from textual.containers import Vertical
-import threading
 from rich.text import Text
 from textual import events
+from textual.timer import Timer
 
-from downloader import search_artist
+import aio
+from downloader import get_cached_search
 
 
 class SearchResultItem(ListItem):
@@ -63,11 +64,19 @@ class SearchScreen(Screen):
     }
     """
 
+    # Seconds of typing inactivity before a search is started
+    DEBOUNCE = 0.35
+
     def __init__(self, on_select: Callable[[str, str], None]):
         super().__init__()
         self.on_select = on_select
         self.results: List[Dict[str, str]] = []
 
+        # Bumped on every query change; results from older generations are dropped
+        self._generation = 0
+        self._query = ""  # of the current generation
+        self._debounce: Optional[Timer] = None
+
     def compose(self):
         with Vertical(id="search_page"):
             # Use Rich Text for title
@@ -84,28 +93,78 @@ class SearchScreen(Screen):
         # Focus the input so typing works immediately
         self.set_focus(self.input)
 
+    def on_input_changed(self, event: Input.Changed):
+        self._schedule(event.value.strip(), delay=self.DEBOUNCE)
+
     async def on_input_submitted(self, event: Input.Submitted):
         query = event.value.strip()
+        if query and query == self._query:
+            # Already searched, searching or debouncing: start a waiting search now, never restart one
+            if self._debounce is not None:
+                self._debounce.stop()
+                self._debounce = None
+                self._start_search(query, self._generation)
+        else:
+            self._schedule(query, delay=0)
+        self.list_view.focus()
+
+    def _schedule(self, query: str, delay: float):
+        """Supersede any pending or running search with one for query."""
+        self._generation += 1
+        self._query = query
+        if self._debounce is not None:
+            self._debounce.stop()
+            self._debounce = None
+        # Cancelling the worker stops the search thread at its next result
+        self.workers.cancel_group(self, "search")
+
         if not query:
+            self._update_results(self._generation, [])
+            return
+
+        # Repeat queries render straight from the cache
+        cached = get_cached_search(query)
+        if cached is not None:
+            self._update_results(self._generation, cached)
             return
 
-        # Clear previous results
+        generation = self._generation
+        if delay:
+            self._debounce = self.set_timer(delay, lambda: self._start_search(query, generation))
+        else:
+            self._start_search(query, generation)
+
+    def _start_search(self, query: str, generation: int):
+        if generation != self._generation:
+            return
+        self._debounce = None  # fired, or never set
+
         self.list_view.clear()
-        self.results.clear()
         self.list_view.append(ListItem(Static("Searching...")))
 
-        # Background search
-        threading.Thread(target=self._search_artist, args=(query,), daemon=True).start()
+        # Background search; a newer one cancels it
+        self.run_worker(self._search_artist(query, generation), group="search", exclusive=True)
 
-    def _search_artist(self, query: str):
-        self.results = search_artist(query)
-        self.list_view.focus()
-        self.call_later(self._update_results)
+    async def _search_artist(self, query: str, generation: int):
+        def partial(results: List[Dict[str, str]]):
+            self._update_results(generation, results, False)
+
+        try:
+            results = await aio.search_artist(query, on_result=partial)
+        except Exception as e:
+            results = [{"handle": "", "artist": f"Search failed: {e}"}]
+        self._update_results(generation, results)
+
+    def _update_results(self, generation: int, results: List[Dict[str, str]], final: bool = True):
+        if generation != self._generation:
+            return
 
-    def _update_results(self):
+        self.results = list(results)
         self.list_view.clear()
         for r in self.results:
             self.list_view.append(SearchResultItem(r["handle"], r["artist"]))
+        if not final:
+            self.list_view.append(ListItem(Static("Searching...")))
 
     async def key_enter(self, event: events.Key):
         """Select the highlighted result."""
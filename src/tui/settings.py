@@ -1,5 +1,76 @@
+from typing import Any, Callable, Dict
+
+from textual.binding import Binding
+from textual.containers import Vertical
 from textual.screen import Screen
+from textual.widgets import Footer, Header, Input, Static
+
+from throttle import format_rate, parse_rate
+
 
 class SettingsScreen(Screen):
-    pass
+    """Session download settings; changes apply to the running and next downloads."""
+
+    CSS = """
+    #settings_page { width: 60; height: auto; padding: 1 2; border: tall $primary; }
+    .SettingLabel { padding-top: 1; color: cyan; }
+    .SettingHint { color: $text-muted; }
+    """
+
+    BINDINGS = [
+        Binding("escape", "cancel", "Cancel"),
+        Binding("ctrl+s", "save", "Save"),
+    ]
+
+    def __init__(self, settings: Dict[str, Any], on_save: Callable[[Dict[str, Any]], None]):
+        """
+        :param settings: Current values of limit_rate (bytes/s, 0 = unlimited),
+            download_workers and max_connections.
+        :param on_save: Called with the new values when the user saves.
+        """
+        super().__init__()
+        self.settings = settings
+        self.on_save = on_save
+
+    def compose(self):
+        yield Header()
+        with Vertical(id="settings_page"):
+            yield Static("Bandwidth limit", classes="SettingLabel")
+            yield Input(self._rate_text(self.settings["limit_rate"]), id="limit_rate")
+            yield Static("Total for all downloads, e.g. 500K or 2M; 0 for unlimited", classes="SettingHint")
+
+            yield Static("Parallel downloads", classes="SettingLabel")
+            yield Input(str(self.settings["download_workers"]), id="download_workers", type="integer")
+            yield Static("Tracks downloading at the same time (from the next batch)", classes="SettingHint")
+
+            yield Static("Connections", classes="SettingLabel")
+            yield Input(str(self.settings["max_connections"]), id="max_connections", type="integer")
+            yield Static("Most parallel connections for long tracks, shared by running downloads", classes="SettingHint")
+        yield Footer()
+
+    def on_mount(self):
+        self.query_one("#limit_rate", Input).focus()
+
+    @staticmethod
+    def _rate_text(rate: float) -> str:
+        return "0" if rate <= 0 else format_rate(rate).removesuffix("/s")
+
+    def on_input_submitted(self, event: Input.Submitted):
+        self.action_save()
+
+    def action_save(self):
+        try:
+            settings = {
+                "limit_rate": parse_rate(self.query_one("#limit_rate", Input).value),
+                "download_workers": max(1, int(self.query_one("#download_workers", Input).value)),
+                "max_connections": max(1, int(self.query_one("#max_connections", Input).value)),
+            }
+        except ValueError as e:
+            self.notify(str(e), severity="error")
+            return
+
+        self.on_save(settings)
+        self.app.pop_screen()
 
+    def action_cancel(self):
+        self.app.pop_screen()
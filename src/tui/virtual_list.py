@@ -0,0 +1,151 @@
+from typing import Callable, Optional
+
+from rich.text import Text
+from textual import events
+from textual.binding import Binding
+from textual.geometry import Size
+from textual.message import Message
+from textual.scroll_view import ScrollView
+from textual.strip import Strip
+
+
+class VirtualList(ScrollView, can_focus=True):
+    """
+    A list that renders only its visible rows.
+
+    Rows are not widgets: the list only knows how many there are and asks
+    `render_row(index)` for the label of each row it paints. The data and any
+    selection state live in the caller's model, so swapping the contents or
+    moving the cursor costs O(visible rows) whatever the list size.
+    """
+
+    COMPONENT_CLASSES = {"virtual-list--cursor"}
+
+    DEFAULT_CSS = """
+    VirtualList > .virtual-list--cursor { background: $secondary 40%; }
+    VirtualList:focus > .virtual-list--cursor { background: $secondary; text-style: bold; }
+    """
+
+    BINDINGS = [
+        Binding("up", "cursor_up", "Up", show=False),
+        Binding("down", "cursor_down", "Down", show=False),
+        Binding("pageup", "page_up", "Page Up", show=False),
+        Binding("pagedown", "page_down", "Page Down", show=False),
+        Binding("home", "first", "First", show=False),
+        Binding("end", "last", "Last", show=False),
+    ]
+
+    class Highlighted(Message):
+        """Posted when the cursor moves to another row."""
+
+        def __init__(self, virtual_list: "VirtualList", index: int):
+            super().__init__()
+            self.virtual_list = virtual_list
+            self.index = index
+
+        @property
+        def control(self) -> "VirtualList":
+            return self.virtual_list
+
+    def __init__(
+        self,
+        render_row: Callable[[int], str],
+        *,
+        id: Optional[str] = None,
+        classes: Optional[str] = None,
+    ):
+        super().__init__(id=id, classes=classes)
+        self.render_row = render_row
+        self.count = 0
+        self.index: Optional[int] = None
+
+    # -------------------------
+    # Model
+    # -------------------------
+    def set_count(self, count: int, reset: bool = False) -> None:
+        """Point the list at `count` rows; keeps the cursor unless reset."""
+        self.count = count
+        self.virtual_size = Size(self.size.width, count)
+
+        if count == 0:
+            self.index = None
+        elif reset or self.index is None:
+            self.scroll_to(y=0, animate=False)
+            self.move_cursor(0)
+        elif self.index >= count:
+            self.move_cursor(count - 1)
+        self.refresh()
+
+    def refresh_row(self, index: int) -> None:
+        """Repaint one row after its model entry changed."""
+        y = index - int(self.scroll_offset.y)
+        if 0 <= y < self.size.height:
+            self.refresh_line(y)
+
+    def move_cursor(self, index: int) -> None:
+        if not self.count:
+            return
+        index = max(0, min(index, self.count - 1))
+        previous, self.index = self.index, index
+
+        top = int(self.scroll_offset.y)
+        height = max(self.scrollable_content_region.height, 1)
+        if index < top:
+            self.scroll_to(y=index, animate=False)
+        elif index >= top + height:
+            self.scroll_to(y=index - height + 1, animate=False)
+
+        if previous is not None:
+            self.refresh_row(previous)
+        self.refresh_row(index)
+        if previous != index:
+            self.post_message(self.Highlighted(self, index))
+
+    # -------------------------
+    # Rendering
+    # -------------------------
+    def render_line(self, y: int) -> Strip:
+        scroll_x, scroll_y = self.scroll_offset
+        row = scroll_y + y
+        width = self.size.width
+        style = self.rich_style
+
+        if row >= self.count:
+            return Strip.blank(width, style)
+
+        if row == self.index:
+            style = style + self.get_component_rich_style("virtual-list--cursor")
+
+        text = Text(self.render_row(row), no_wrap=True, style=style)
+        text.truncate(width, overflow="ellipsis")
+        strip = Strip(text.render(self.app.console))
+        return strip.crop_extend(scroll_x, scroll_x + width, style)
+
+    def on_resize(self, event: events.Resize) -> None:
+        self.virtual_size = Size(event.size.width, self.count)
+
+    # -------------------------
+    # Actions
+    # -------------------------
+    def on_click(self, event: events.Click) -> None:
+        offset = event.get_content_offset(self)
+        if offset is not None:
+            self.move_cursor(int(self.scroll_offset.y) + offset.y)
+
+    def action_cursor_up(self) -> None:
+        self.move_cursor((self.index or 0) - 1)
+
+    def action_cursor_down(self) -> None:
+        self.move_cursor(-1 if self.index is None else self.index + 1)
+
+    def action_page_up(self) -> None:
+        self.move_cursor((self.index or 0) - self.scrollable_content_region.height)
+
+    def action_page_down(self) -> None:
+        self.move_cursor((self.index or 0) + self.scrollable_content_region.height)
+
+    def action_first(self) -> None:
+        self.move_cursor(0)
+
+    def action_last(self) -> None:
+        self.move_cursor(self.count - 1)
@@ -1,5 +1,6 @@
 from pathlib import Path
 from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlparse
 import re
 
 _JUNK_PAREN_RE = re.compile(
@@ -26,6 +27,11 @@ def extract_track_title(
     track_no = parts[0].strip()
     title = parts[1].strip() if len(parts) > 1 else ""
 
+    return track_no, clean_title(title, artist)
+
+
+def clean_title(title: str, artist: Optional[str] = None) -> str:
+    """Strip a leading "Artist - " and junk like "(Official Video)" from a title."""
     if artist:
         title = re.sub(
             rf"^{re.escape(artist)}\s*-\s*",
@@ -36,6 +42,26 @@ def extract_track_title(
 
     title = _JUNK_PAREN_RE.sub("", title)
 
-    title = re.sub(r"\s{2,}", " ", title).strip()
+    return re.sub(r"\s{2,}", " ", title).strip()
+
+
+def normalize(text: str) -> str:
+    """Casefold and reduce to space-separated alphanumeric words, for matching."""
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def lyrics_key(artist: str, title: str, duration: Optional[float] = None) -> str:
+    """Normalized (artist, title, duration) key identifying a song's lyrics."""
+    seconds = str(round(duration)) if duration else ""
+    return f"{normalize(artist)}|{normalize(clean_title(title, artist))}|{seconds}"
+
 
-    return track_no, title
+def video_id(url: str) -> str:
+    """YouTube video id of a watch/short/youtu.be url; the url itself if it has none."""
+    parsed = urlparse(url)
+    ids = parse_qs(parsed.query).get("v")
+    if ids:
+        return ids[0]
+    if parsed.netloc.endswith("youtu.be") or parsed.path.startswith("/shorts/"):
+        return parsed.path.rstrip("/").rsplit("/", 1)[-1]
+    return url